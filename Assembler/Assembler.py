@@ -25,9 +25,47 @@ program as an argument. The resulting machine code will be printed to stdout.
 
 Example:
     $ python assembler.py program.asm
+    $ python assembler.py --binary -o program.bin program.asm
+    $ python assembler.py --stream -o program.hack huge_program.asm
+    $ python assembler.py --jobs 8 -o program.hack huge_program.asm
+    $ python assembler.py --jobs 8 build/ 'lib/*.asm' extra.asm
+    $ python assembler.py --incremental -o program.hack program.asm
+    $ python assembler.py -O --stats program.asm
+    $ python assembler.py --source-map program.map program.asm
+    $ python VMTranslator.py Main.vm | python assembler.py - > Main.hack
+
+With --binary the program is written as packed big-endian 16-bit words instead
+of the textual .hack format. With --stream the file is read twice instead of
+being held in memory, so very large programs assemble in constant memory.
+With --jobs both passes are split across a pool of worker processes.
+Given several files, directories or globs (or --batch), every file is assembled
+concurrently and its .hack written next to the source, followed by a summary.
+With --incremental a cache (program.asm.asmcache) is kept so that the next run
+only re-assembles the parts of the program that changed. -O runs a peephole
+optimizer over the parsed program before the first pass.
+A file name of '-' reads the program from stdin; it is assembled like --stream,
+with the first pass spilling the input to a temporary file for the second.
 
 """
 
+import glob
+import hashlib
+import os
+import pickle
+import re
+import sys
+import tempfile
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+try:
+    # optional; enables Assembler.generateWordsNumpy's vectorized backend
+    import numpy
+except ImportError:
+    numpy = None
+
 instruction_type = ['NULL','A_INSTRUCTION','C_INSTRUCTION','L_INSTRUCTION']
 
 instruction_dest = ['NULL','M','D','MD','A','AM','AD','AMD']
@@ -46,25 +84,493 @@ instruction_comp = ['NULL',
                     'D&A','D&M',
                     'D|A','D|M']
 
+# 7-bit a+cccccc codes, parallel to instruction_comp
+comp_codes = ['NULL',
+              '0101010','0111111','0111010',
+              '0110000','1110000','0001100',
+              '0110001','1110001','0001101',
+              '0110011','1110011','0001111',
+              '0110111','1110111','0011111',
+              '0110010','1110010','0001110',
+              '0000010','1000010',
+              '0010011','1010011','0000111','1000111',
+              '0000000','1000000',
+              '0010101','1010101']
+
+# commutative spellings that compilers commonly emit, mapped to their canonical comp
+comp_aliases = {'A+D': 'D+A', 'M+D': 'D+M',
+                'A&D': 'D&A', 'M&D': 'D&M',
+                'A|D': 'D|A', 'M|D': 'D|M'}
+
+# lookup tables derived from the lists above; dest and jump bits are simply the list index
+comp_table = dict(zip(instruction_comp[1:], comp_codes[1:]))
+for alias, canonical in comp_aliases.items():
+    comp_table[alias] = comp_table[canonical]
+dest_table = {dest: '{:03b}'.format(i) for i, dest in enumerate(instruction_dest)}
+jump_table = {jump: '{:03b}'.format(i) for i, jump in enumerate(instruction_jump)}
+
+
+class AssemblerError(Exception):
+    """
+    Raised when an assembly instruction cannot be encoded
+    """
+    def __init__(self, message="An error occurred while assembling."):
+        self.message = message
+        super().__init__(self.message)
+
+
+# symbol kinds recorded in SymbolTable.kinds
+PREDEFINED, LABEL, VARIABLE = 0, 1, 2
+
+predefined_symbols = {'SP': 0, 'LCL': 1, 'ARG': 2, 'THIS': 3, 'THAT': 4,
+                      'R0': 0, 'R1': 1, 'R2': 2, 'R3': 3, 'R4': 4,
+                      'R5': 5, 'R6': 6, 'R7': 7, 'R8': 8, 'R9': 9,
+                      'R10': 10, 'R11': 11, 'R12': 12, 'R13': 13, 'R14': 14, 'R15': 15,
+                      'SCREEN': 16384, 'KBD': 24576}
+
+
 class SymbolTable:
+    """
+    Maps symbol names to addresses.
+
+    Names are interned and given small integer ids; the address and kind (predefined,
+    label or variable) of each id live in compact arrays. Labels are bound to ROM
+    addresses explicitly, while each variable is allocated exactly one RAM word
+    starting at 16. Once the first pass is complete the table can be frozen, after
+    which it is read-only and can be shared with worker processes.
+    """
+
     def __init__(self):
-        # initialises the symbol table with empty dictionary
-        self.table = {'SP': 0, 'LCL': 1, 'ARG': 2, 'THIS': 3, 'THAT': 4, 
-                      'R0': 0, 'R1': 1, 'R2': 2, 'R3': 3, 'R4': 4, 
-                      'R5': 5, 'R6': 6, 'R7': 7, 'R8': 8, 'R9': 9, 
-                      'R10': 10, 'R11': 11, 'R12': 12, 'R13': 13, 'R14': 14, 'R15': 15, 
-                      'SCREEN': 16384, 'KBD': 24576}
+        # name -> id, id -> name, id -> address, id -> kind
+        self.ids = {}
+        self.names = []
+        self.addresses = array('i')
+        self.kinds = bytearray()
+        self.frozen = False
         # initialises next variable address to 16
         self.next_variable_address = 16
+        self.preload(predefined_symbols.items(), PREDEFINED)
+
+    def __contains__(self, symbol):
+        return symbol in self.ids
+
+    def __len__(self):
+        return len(self.names)
+
+    def _add(self, symbol, value, kind):
+        if self.frozen:
+            raise AssemblerError("Cannot add '{}': the symbol table is frozen".format(symbol))
+        symbol_id = len(self.names)
+        symbol = sys.intern(symbol)
+        self.ids[symbol] = symbol_id
+        self.names.append(symbol)
+        self.addresses.append(value)
+        self.kinds.append(kind)
+        return symbol_id
 
     def addSymbol(self, symbol, value):
-        # add a symbol and its value to the symbol table
-        self.table[symbol] = value
-        self.next_variable_address += 1
+        # add a symbol bound to an explicit address; no RAM is allocated
+        return self._add(symbol, value, LABEL)
+
+    def addLabel(self, label, address):
+        """
+        Binds a label to the ROM address of the instruction that follows it.
+        @return: The label's id.
+        """
+        return self._add(label, address, LABEL)
+
+    def addVariable(self, variable):
+        """
+        Allocates the next free RAM word to a variable.
+        @return: The variable's address.
+        """
+        address = self.next_variable_address
+        self._add(variable, address, VARIABLE)
+        self.next_variable_address = address + 1
+        return address
+
+    def preload(self, items, kind=LABEL):
+        """
+        Adds many (name, address) pairs at once, e.g. the results of a previous first pass.
+        Names already in the table are skipped.
+
+        @param items: An iterable of (name, address) pairs.
+        @param kind: The kind recorded for the new symbols.
+        """
+        if self.frozen:
+            raise AssemblerError("Cannot preload: the symbol table is frozen")
+        ids = self.ids
+        names = self.names
+        for symbol, value in items:
+            if symbol not in ids:
+                symbol = sys.intern(symbol)
+                ids[symbol] = len(names)
+                names.append(symbol)
+                self.addresses.append(value)
+                self.kinds.append(kind)
+                if kind == VARIABLE and value >= self.next_variable_address:
+                    self.next_variable_address = value + 1
+
+    def freeze(self):
+        """
+        Makes the table read-only, typically after the first pass.
+        @return: The table itself.
+        """
+        self.frozen = True
+        return self
 
     def getSymbol(self, symbol):
         # returns value of a symbol in the symbol table or -1 if not found
-        return self.table.get(symbol, -1)
+        symbol_id = self.ids.get(symbol)
+        if symbol_id is None:
+            return -1
+        return self.addresses[symbol_id]
+
+    def getId(self, symbol):
+        # returns the interned id of a symbol or -1 if not found
+        return self.ids.get(symbol, -1)
+
+    def items(self, kind=None):
+        """
+        @param kind: Restrict to PREDEFINED, LABEL or VARIABLE symbols; all symbols if omitted.
+        @return: A list of (name, address) pairs in the order they were added.
+        """
+        addresses = self.addresses
+        kinds = self.kinds
+        return [(name, addresses[i]) for i, name in enumerate(self.names) if kind is None or kinds[i] == kind]
+
+    @property
+    def table(self):
+        # a plain dict view of the table, for callers that want one
+        return dict(self.items())
+
+    def memoryUsage(self):
+        """
+        @return: A dict of the approximate bytes used by each part of the table, plus a 'total'.
+        """
+        usage = {'ids': sys.getsizeof(self.ids),
+                 'names': sys.getsizeof(self.names) + sum(sys.getsizeof(name) for name in self.names),
+                 'addresses': sys.getsizeof(self.addresses),
+                 'kinds': sys.getsizeof(self.kinds)}
+        usage['total'] = sum(usage.values())
+        return usage
+
+    def memoryReport(self):
+        """
+        @return: A one-line summary of the table's size and memory usage.
+        """
+        kinds = self.kinds
+        usage = self.memoryUsage()
+        return 'Symbol table: {} labels, {} variables, {} bytes ({})'.format(
+            kinds.count(LABEL), kinds.count(VARIABLE), usage['total'],
+            ', '.join('{} {}'.format(key, value) for key, value in usage.items() if key != 'total'))
+
+
+class AssemblyCache:
+    """
+    On-disk cache of a previous assembly run, used by Assembler.assembleIncremental.
+
+    Blocks are keyed by the hash of their text and store
+    [instruction count, labels, referenced symbols, encoded words, addresses of those symbols].
+    """
+    # bump whenever the cache layout or the encoding changes
+    VERSION = 2
+
+    def __init__(self, path):
+        self.path = path
+        self.source_hash = None
+        self.blocks = {}
+        self.words = b''
+        self.labels = None
+        self.variables = None
+        self.resetStats()
+        self.load()
+
+    def resetStats(self):
+        # per-run counters
+        self.blocks_total = 0
+        self.blocks_scanned = 0
+        self.blocks_encoded = 0
+
+    def load(self):
+        """
+        Loads the cache from disk, silently starting empty if it is missing, stale or unreadable.
+        """
+        try:
+            with open(self.path, "rb") as cache_file:
+                data = pickle.load(cache_file)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+            return
+        if not isinstance(data, dict) or data.get('version') != self.VERSION:
+            return
+        self.source_hash = data['source_hash']
+        self.blocks = data['blocks']
+        self.words = data['words']
+        self.labels = data['labels']
+        self.variables = data['variables']
+
+    def update(self, source_hash, blocks, words, symbolTable):
+        self.source_hash = source_hash
+        self.blocks = blocks
+        self.words = words.tobytes()
+        self.labels = symbolTable.items(LABEL)
+        self.variables = symbolTable.items(VARIABLE)
+        self.blocks_total = len(blocks)
+
+    def save(self):
+        """
+        Atomically writes the cache to disk.
+        """
+        data = {'version': self.VERSION, 'source_hash': self.source_hash, 'blocks': self.blocks,
+                'words': self.words, 'labels': self.labels, 'variables': self.variables}
+        temp_path = self.path + '.tmp'
+        with open(temp_path, "wb") as cache_file:
+            pickle.dump(data, cache_file, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self.path)
+
+    def stats(self):
+        """
+        @return: A one-line summary of the last run.
+        """
+        return 'Incremental cache: {} blocks, {} re-scanned, {} re-encoded'.format(
+            self.blocks_total, self.blocks_scanned, self.blocks_encoded)
+
+
+class Instruction:
+    """
+    A single parsed line of Hack assembly.
+
+    Lines are tokenized once by Assembler.parseLine so the two passes never
+    have to strip, split or re-classify the source text again.
+    kind is one of instruction_type; symbol holds the label/variable name or an
+    int for numeric A-instructions; dest/comp/jump hold the C-instruction fields
+    ('NULL' when absent); line is the 1-based source line number.
+    """
+    __slots__ = ('kind', 'symbol', 'dest', 'comp', 'jump', 'line')
+
+    def __init__(self, kind, symbol=None, dest='NULL', comp='NULL', jump='NULL', line=0):
+        self.kind = kind
+        self.symbol = symbol
+        self.dest = dest
+        self.comp = comp
+        self.jump = jump
+        self.line = line
+
+    def __repr__(self):
+        if self.kind == 'C_INSTRUCTION':
+            return 'Instruction({}, {}={};{}, line={})'.format(self.kind, self.dest, self.comp, self.jump, self.line)
+        return 'Instruction({}, {!r}, line={})'.format(self.kind, self.symbol, self.line)
+
+
+class CInstructionEncoder:
+    """
+    Table-driven encoder for C-instructions.
+
+    Each distinct (dest, comp, jump) combination is encoded once and cached, so
+    programs that reuse a handful of C-instructions pay only a dict lookup per word.
+    """
+
+    def __init__(self):
+        # maps (dest, comp, jump) to (16-bit word, 16-character bit string)
+        self.cache = {}
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, dest, comp, jump):
+        """
+        Returns the cached (word, bits) pair for a C-instruction, encoding it on first use.
+
+        @param dest: The destination mnemonic ('NULL' when absent).
+        @param comp: The computation mnemonic.
+        @param jump: The jump mnemonic ('NULL' when absent).
+        @return: A tuple of the instruction as an int and as a 16-character binary string.
+        """
+        key = (dest, comp, jump)
+        entry = self.cache.get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        self.misses += 1
+
+        comp_bits = comp_table.get(comp)
+        if comp_bits is None:
+            raise AssemblerError("Invalid comp field '{}'".format(comp))
+        dest_bits = dest_table.get(dest)
+        if dest_bits is None:
+            raise AssemblerError("Invalid dest field '{}'".format(dest))
+        jump_bits = jump_table.get(jump)
+        if jump_bits is None:
+            raise AssemblerError("Invalid jump field '{}'".format(jump))
+
+        bits = '111' + comp_bits + dest_bits + jump_bits
+        entry = (int(bits, 2), bits)
+        self.cache[key] = entry
+        return entry
+
+    def encode(self, dest, comp, jump):
+        """
+        Encodes a C-instruction as a 16-bit word.
+        @return: The instruction as an int.
+        """
+        return self.lookup(dest, comp, jump)[0]
+
+    def encodeBits(self, dest, comp, jump):
+        """
+        Encodes a C-instruction as text.
+        @return: The instruction as a 16-character binary string.
+        """
+        return self.lookup(dest, comp, jump)[1]
+
+    def hitRate(self):
+        """
+        @return: The fraction of lookups served from the cache (0.0 before any lookup).
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        """
+        @return: A one-line summary of the cache usage.
+        """
+        return 'C-instruction cache: {} distinct, {} hits, {} misses, {:.1%} hit rate'.format(
+            len(self.cache), self.hits, self.misses, self.hitRate())
+
+
+class PeepholeOptimizer:
+    """
+    Removes redundant instructions from a parsed instruction stream before encoding.
+
+    Every rule only looks within a basic block: a label is a possible jump target, so
+    nothing known about the registers survives it. Label addresses are not touched
+    here; they are simply recomputed by the first pass over the optimized stream.
+    Jump targets must therefore be labels, not numeric ROM addresses.
+
+    Rules:
+    - redundant-load: '@X' when A is already known to hold X.
+    - dead-a-load: '@X' immediately overwritten by another A-instruction.
+    - dead-a-write: 'A=comp' (no jump) immediately overwritten by an A-instruction.
+    - inc-dec: 'M=M+1' followed by 'AM=M-1' becomes 'A=M'; 'M=M+1'/'M=M-1' pairs cancel.
+    - store-reload: 'D=M' straight after 'M=D' is dropped.
+    - jump-to-next: '@X', '0;JMP' immediately followed by '(X)' loses the jump.
+    - unreachable: instructions between an unconditional jump and the next label.
+    """
+    RULES = ('redundant-load', 'dead-a-load', 'dead-a-write', 'inc-dec',
+             'store-reload', 'jump-to-next', 'unreachable')
+
+    def __init__(self, max_passes=8):
+        self.max_passes = max_passes
+        self.hits = dict.fromkeys(self.RULES, 0)
+        self.words_before = 0
+        self.words_after = 0
+        # programs left alone because they jump to numeric addresses
+        self.skipped = 0
+
+    def optimize(self, instructions):
+        """
+        Applies the rules repeatedly until nothing changes (or max_passes is reached).
+
+        @param instructions: An iterable of parsed Instructions.
+        @return: A new list of Instructions.
+        """
+        records = list(instructions)
+        words = sum(1 for record in records if record.kind != 'L_INSTRUCTION')
+        self.words_before += words
+        if self._hasNumericJump(records):
+            self.skipped += 1
+            self.words_after += words
+            return records
+        for _ in range(self.max_passes):
+            count = len(records)
+            records = self._optimizePass(records)
+            if len(records) == count:
+                break
+        self.words_after += sum(1 for record in records if record.kind != 'L_INSTRUCTION')
+        return records
+
+    def _hasNumericJump(self, records):
+        # a jump whose target was loaded as '@<number>' rather than '@LABEL'
+        for previous, record in zip(records, records[1:]):
+            if (record.kind == 'C_INSTRUCTION' and record.jump != 'NULL'
+                    and previous.kind == 'A_INSTRUCTION' and isinstance(previous.symbol, int)):
+                return True
+        return False
+
+    def _optimizePass(self, records):
+        hits = self.hits
+        out = []
+        append = out.append
+        # the symbol A is known to hold, or None
+        known_a = None
+        reachable = True
+        for record in records:
+            kind = record.kind
+            if kind == 'L_INSTRUCTION':
+                # '@X', '0;JMP', '(X)' jumps to the very next instruction
+                if (len(out) >= 2 and out[-1].kind == 'C_INSTRUCTION' and out[-1].jump == 'JMP'
+                        and out[-1].dest == 'NULL' and out[-2].kind == 'A_INSTRUCTION'
+                        and out[-2].symbol == record.symbol):
+                    out.pop()
+                    hits['jump-to-next'] += 1
+                append(record)
+                known_a = None
+                reachable = True
+                continue
+            if not reachable:
+                hits['unreachable'] += 1
+                continue
+
+            previous = out[-1] if out else None
+            if kind == 'A_INSTRUCTION':
+                symbol = record.symbol
+                if known_a is not None and known_a == symbol:
+                    hits['redundant-load'] += 1
+                    continue
+                if previous is not None:
+                    if previous.kind == 'A_INSTRUCTION':
+                        out.pop()
+                        hits['dead-a-load'] += 1
+                    elif previous.kind == 'C_INSTRUCTION' and previous.dest == 'A' and previous.jump == 'NULL':
+                        out.pop()
+                        hits['dead-a-write'] += 1
+                append(record)
+                known_a = symbol
+                continue
+
+            dest, comp, jump = record.dest, record.comp, record.jump
+            if previous is not None and previous.kind == 'C_INSTRUCTION' and previous.jump == 'NULL' and jump == 'NULL':
+                before = (previous.dest, previous.comp)
+                if before == ('M', 'M+1') and dest == 'AM' and comp == 'M-1':
+                    # RAM[A] is restored and A takes its original value
+                    out[-1] = Instruction('C_INSTRUCTION', None, 'A', 'M', 'NULL', record.line)
+                    known_a = None
+                    hits['inc-dec'] += 1
+                    continue
+                if dest == 'M' and ((before == ('M', 'M+1') and comp == 'M-1') or
+                                    (before == ('M', 'M-1') and comp == 'M+1')):
+                    out.pop()
+                    hits['inc-dec'] += 1
+                    continue
+                if before == ('M', 'D') and dest == 'D' and comp == 'M':
+                    hits['store-reload'] += 1
+                    continue
+            append(record)
+            if 'A' in dest:
+                known_a = None
+            if jump == 'JMP':
+                reachable = False
+        return out
+
+    def stats(self):
+        """
+        @return: A multi-line summary of the rule hits and ROM words saved.
+        """
+        lines = ['Peephole: {} -> {} words ({} saved)'.format(
+            self.words_before, self.words_after, self.words_before - self.words_after)]
+        if self.skipped:
+            lines.append('  skipped {} program(s) with numeric jump targets'.format(self.skipped))
+        for rule in self.RULES:
+            lines.append('  {:<15} {}'.format(rule, self.hits[rule]))
+        return '\n'.join(lines)
 
 
 class Assembler:
@@ -73,34 +579,101 @@ class Assembler:
         """
         Assembler constructor
         """
+        # shared so the C-instruction cache carries across passes and files
+        self.encoder = CInstructionEncoder()
+
+    def parseLine(self, line, line_number=0):
+        """
+        Tokenizes a single line of assembly into an Instruction record.
+
+        @param line: A raw line of assembly, possibly with whitespace and a trailing // comment.
+        @param line_number: The source line number to record on the instruction.
+        @return: An Instruction, or None for blank lines, comments and unrecognised lines.
+        """
+        # drop any trailing comment before classifying the line
+        comment = line.find('//')
+        if comment != -1:
+            line = line[:comment]
+        line = line.strip()
+        if not line:
+            return None
+
+        first = line[0]
+        if first == '@':
+            symbol = line[1:]
+            # numeric constants are converted once here rather than on every lookup
+            if symbol.isnumeric():
+                symbol = int(symbol)
+                if symbol > 32767:
+                    raise AssemblerError('line {}: constant {} does not fit in 15 bits'.format(line_number, symbol))
+            return Instruction('A_INSTRUCTION', symbol, line=line_number)
+        if first == '(' and line[-1] == ')':
+            return Instruction('L_INSTRUCTION', line[1:-1], line=line_number)
+
+        # split dest=comp;jump in a single scan of the string
+        dest, eq, rest = line.partition('=')
+        if not eq:
+            rest = dest
+            dest = 'NULL'
+        comp, semi, jump = rest.partition(';')
+        if not eq and not semi:
+            return None
+        return Instruction('C_INSTRUCTION', None, dest, comp, jump if semi else 'NULL', line_number)
+
+    def parseInstructions(self, lines):
+        """
+        Tokenizes assembly source into a list of Instruction records.
+
+        @param lines: An iterable of assembly lines (e.g. an open file) or already parsed Instructions.
+        @return: A list of Instructions with blank lines and comments removed.
+        """
+        return list(self.iterInstructions(lines))
+
+    def iterInstructions(self, lines):
+        """
+        Lazily tokenizes assembly source, holding only one line in memory at a time.
+
+        @param lines: An iterable of assembly lines (e.g. an open file) or already parsed Instructions.
+        @return: A generator of Instructions with blank lines and comments removed.
+        """
+        parseLine = self.parseLine
+        for line_number, line in enumerate(lines, 1):
+            if isinstance(line, Instruction):
+                yield line
+                continue
+            record = parseLine(line, line_number)
+            if record is not None:
+                yield record
+
+    def optimize(self, instructions, optimizer=None):
+        """
+        Optional stage between parsing and the first pass; applies the peephole rules.
+
+        @param instructions: An iterable of the assembly language instructions, or their parsed Instructions.
+        @param optimizer: The PeepholeOptimizer to use (and accumulate hit counts in); a new one if omitted.
+        @return: The optimized list of Instructions.
+        """
+        if optimizer is None:
+            optimizer = PeepholeOptimizer()
+        return optimizer.optimize(self.iterInstructions(instructions))
 
     def buildSymbolTable(self, instructions, symbolTable):
         """
         Assembler first pass; populates symbol table with label locations.
 
-        @param instructions: A list of the assembly language instructions.
+        @param instructions: An iterable of the assembly language instructions, or their parsed Instructions.
         @param symbolTable: The symbol table to populate.
         """
         # initializes the instruction address to 0
         instruction_address = 0
-        for instruction in instructions:
-            # determine he type of instruction
-            instruction_type = self.parseInstructionType(instruction)
-            # print("Instruction:", instruction)
-            #print("Instruction Type:", instruction_type)
-            if instruction_type == 'L_INSTRUCTION':
-                # extract label from instruction
-                label = self.parseSymbol(instruction)
+        for instruction in self.iterInstructions(instructions):
+            if instruction.kind == 'L_INSTRUCTION':
                 # add the label to symbol table if it doesnt exist already
-                if symbolTable.getSymbol(label) == -1:
-                    symbolTable.addSymbol(label, instruction_address)
-
-                    # print("Label:", label)
-                    # print("Instruction Address:", instruction_address)
-                    # print("Symbol Table:", symbolTable.table)
-
-            # increment the instruction address for nonlabel and non null instruction
-            elif instruction_type != 'NULL':
+                label = instruction.symbol
+                if label not in symbolTable:
+                    symbolTable.addLabel(label, instruction_address)
+            else:
+                # every other parsed instruction occupies one ROM word
                 instruction_address += 1
 
 
@@ -108,51 +681,378 @@ class Assembler:
         """
         Assembler second pass; Translates a set of instructions to machine code.
 
-        @param instructions: A list of the assembly language instructions to be converted to machine code.
+        @param instructions: A list of the assembly language instructions (or parsed Instructions) to be converted to machine code.
         @param symbolTable: The symbol table to reference/update.
         @return: A String containing the generated machine code as strings of 16-bit binary instructions, 1-per-line.
         """
         # initialise empty list to store machine code instructions
         machine_code = []
+        encodeBits = self.encoder.encodeBits
 
-        for instruction in instructions:
-            # determine the type of instruction
-            instruction_type = self.parseInstructionType(instruction)
-            # print("Instruction:", instruction)
-            # print("Instruction Type:", instruction_type)
-            if instruction_type == 'A_INSTRUCTION':
-                # extract symbol from the instruction
-                symbol = self.parseSymbol(instruction)
-                # print("A Instruction Symbol:", symbol)
-
+        for instruction in self.iterInstructions(instructions):
+            if instruction.kind == 'A_INSTRUCTION':
+                symbol = instruction.symbol
                 # if the symbol is not numeric look up or add it to symbol table
-                if not symbol.isnumeric():
-                    if symbolTable.getSymbol(symbol) == -1:
-                        symbolTable.addSymbol(symbol, symbolTable.next_variable_address)
-                    symbol = symbolTable.getSymbol(symbol)
+                if not isinstance(symbol, int):
+                    address = symbolTable.getSymbol(symbol)
+                    symbol = address if address != -1 else symbolTable.addVariable(symbol)
 
-
-                # print("A Instruction Symbol:", symbol)
                 # appends the A instruction machine code t list
-                machine_code.append('0{:015b}'.format(int(symbol)))
-            elif instruction_type == 'C_INSTRUCTION':
-                # parses and translates destination,computation, and jump fields of instruction
-                dest = self.translateDest(self.parseInstructionDest(instruction))
-                comp = self.translateComp(self.parseInstructionComp(instruction))
-                jump = self.translateJump(self.parseInstructionJump(instruction))
+                machine_code.append('0{:015b}'.format(symbol))
+            elif instruction.kind == 'C_INSTRUCTION':
+                # encodes the already parsed destination, computation, and jump fields
+                try:
+                    machine_code.append(encodeBits(instruction.dest, instruction.comp, instruction.jump))
+                except AssemblerError as e:
+                    raise AssemblerError('line {}: {}'.format(instruction.line, e.message)) from None
 
-                # appends the C instruction machine code to list
+        # returns machine code instructions as a separated string at newline
+        return '\n'.join(machine_code).strip()
 
-                # print("C Instruction Dest:", dest)
-                # print("C Instruction Comp:", comp)
-                # print("C Instruction Jump:", jump)
 
-                machine_code.append('111{}{}{}'.format(comp, dest, jump))
-        # returns machine code instructions as a separated string at newline
+    def generateWords(self, instructions, symbolTable):
+        """
+        Assembler second pass producing packed machine code.
 
+        @param instructions: An iterable of the assembly language instructions (or parsed Instructions) to be converted to machine code.
+        @param symbolTable: The symbol table to reference/update.
+        @return: An array('H') holding one 16-bit word per instruction.
+        """
+        words = array('H')
+        append = words.append
+        encode = self.encoder.encode
 
-        return '\n'.join(machine_code).strip()
-       
+        for instruction in self.iterInstructions(instructions):
+            if instruction.kind == 'A_INSTRUCTION':
+                symbol = instruction.symbol
+                if not isinstance(symbol, int):
+                    address = symbolTable.getSymbol(symbol)
+                    symbol = address if address != -1 else symbolTable.addVariable(symbol)
+                    if symbol > 32767:
+                        raise AssemblerError('line {}: address {} of {} does not fit in 15 bits'.format(
+                            instruction.line, symbol, instruction.symbol))
+                # an A-instruction word is just its 15-bit address with the top bit clear
+                append(symbol)
+            elif instruction.kind == 'C_INSTRUCTION':
+                try:
+                    append(encode(instruction.dest, instruction.comp, instruction.jump))
+                except AssemblerError as e:
+                    raise AssemblerError('line {}: {}'.format(instruction.line, e.message)) from None
+        return words
+
+    def generateWordsNumpy(self, instructions, symbolTable):
+        """
+        Assembler second pass using NumPy to resolve symbols and build the words in bulk.
+
+        One Python loop reduces every instruction to a small integer operand: the constant
+        itself, an index into the distinct symbols, or an index into the distinct
+        C-instructions. Only the distinct symbols and C-instructions are then resolved in
+        Python; the per-instruction lookups are gathered from arrays (symbols go through
+        the table's id->address array). Falls back to generateWords without NumPy.
+
+        @param instructions: An iterable of the assembly language instructions (or parsed Instructions) to be converted to machine code.
+        @param symbolTable: The symbol table to reference/update.
+        @return: An array('H') holding one 16-bit word per instruction, identical to generateWords.
+        """
+        if numpy is None:
+            return self.generateWords(instructions, symbolTable)
+
+        # 0 = numeric A-instruction, 1 = symbolic A-instruction, 2 = C-instruction
+        kinds = bytearray()
+        operands = array('l')
+        # distinct symbols and C-instructions, in first-use order
+        symbols = {}
+        c_instructions = {}
+        lines = {}
+        for instruction in self.iterInstructions(instructions):
+            kind = instruction.kind
+            if kind == 'A_INSTRUCTION':
+                symbol = instruction.symbol
+                if isinstance(symbol, int):
+                    kinds.append(0)
+                    operands.append(symbol)
+                else:
+                    kinds.append(1)
+                    index = symbols.get(symbol)
+                    if index is None:
+                        index = symbols[symbol] = len(symbols)
+                        lines[symbol] = instruction.line
+                    operands.append(index)
+            elif kind == 'C_INSTRUCTION':
+                key = (instruction.dest, instruction.comp, instruction.jump)
+                kinds.append(2)
+                index = c_instructions.get(key)
+                if index is None:
+                    index = c_instructions[key] = len(c_instructions)
+                    lines[key] = instruction.line
+                operands.append(index)
+
+        # resolve each distinct symbol to its table id, allocating variables in first-use order
+        symbol_ids = numpy.empty(len(symbols), dtype=numpy.int64)
+        for symbol, index in symbols.items():
+            if symbol not in symbolTable:
+                symbolTable.addVariable(symbol)
+            symbol_ids[index] = symbolTable.getId(symbol)
+        id_addresses = numpy.frombuffer(symbolTable.addresses, dtype=numpy.int32)
+        symbol_addresses = id_addresses[symbol_ids]
+        if len(symbol_addresses) and symbol_addresses.max() > 32767:
+            symbol = list(symbols)[int(symbol_addresses.argmax())]
+            raise AssemblerError('line {}: address {} of {} does not fit in 15 bits'.format(
+                lines[symbol], symbolTable.getSymbol(symbol), symbol))
+
+        c_codes = numpy.empty(len(c_instructions), dtype=numpy.uint16)
+        encode = self.encoder.encode
+        for key, index in c_instructions.items():
+            try:
+                c_codes[index] = encode(*key)
+            except AssemblerError as e:
+                raise AssemblerError('line {}: {}'.format(lines[key], e.message)) from None
+
+        kinds = numpy.frombuffer(kinds, dtype=numpy.uint8)
+        operands = numpy.frombuffer(operands, dtype=numpy.dtype('l'))
+        words = operands.astype(numpy.uint16)
+        mask = kinds == 1
+        words[mask] = symbol_addresses[operands[mask]]
+        mask = kinds == 2
+        words[mask] = c_codes[operands[mask]]
+
+        result = array('H')
+        result.frombytes(words.tobytes())
+        return result
+
+    def sourceMap(self, instructions):
+        """
+        Maps ROM addresses back to the source.
+
+        @param instructions: The parsed Instructions, as passed to generateWords.
+        @return: An array('i') holding the source line of the instruction at each ROM address.
+        """
+        return array('i', [instruction.line for instruction in instructions if instruction.kind != 'L_INSTRUCTION'])
+
+    def writeBinary(self, words, stream):
+        """
+        Writes packed machine code as big-endian 16-bit words in a single write.
+
+        @param words: An array('H') as returned by generateWords.
+        @param stream: A binary file-like object.
+        """
+        if sys.byteorder == 'little':
+            # swap a copy so the caller's array is left untouched
+            words = array('H', words)
+            words.byteswap()
+        stream.write(words.tobytes())
+
+    def writeHack(self, words, stream, chunk_size=4096):
+        """
+        Writes packed machine code in the textual .hack format, one 16-bit binary string per line.
+
+        @param words: An iterable of 16-bit words, e.g. as returned by generateWords.
+        @param stream: A text file-like object.
+        @param chunk_size: The number of lines formatted before each write.
+        """
+        # most programs use few distinct words, so format each one only once
+        formatted = {}
+        chunk = []
+        for word in words:
+            bits = formatted.get(word)
+            if bits is None:
+                bits = formatted[word] = '{:016b}\n'.format(word)
+            chunk.append(bits)
+            if len(chunk) >= chunk_size:
+                stream.write(''.join(chunk))
+                chunk.clear()
+        if chunk:
+            stream.write(''.join(chunk))
+
+    def assembleFile(self, path, stream, binary=False, symbolTable=None, chunk_size=65536):
+        """
+        Assembles a file with a bounded working set, however large it is.
+
+        The first pass streams the file keeping only the symbol table; the second pass
+        re-reads it and encodes/writes at most chunk_size instructions at a time.
+
+        @param path: The path of the .asm file to assemble.
+        @param stream: The file-like object to write to (binary if binary is set, text otherwise).
+        @param binary: Write packed 16-bit words instead of .hack text.
+        @param symbolTable: The symbol table to populate; a fresh one is used if omitted.
+        @param chunk_size: The number of instructions encoded between writes.
+        @return: The populated symbol table.
+        """
+        if symbolTable is None:
+            symbolTable = SymbolTable()
+        # First pass
+        with open(path, "r") as a_file:
+            self.buildSymbolTable(a_file, symbolTable)
+        # Second pass
+        with open(path, "r") as a_file:
+            self.writeChunks(a_file, stream, binary, symbolTable, chunk_size)
+        return symbolTable
+
+    def assembleStream(self, lines, stream, binary=False, symbolTable=None, chunk_size=65536):
+        """
+        Assembles a stream that can only be read once, such as stdin, with a bounded working set.
+
+        Forward labels need the whole program before the first word can be written, so the first
+        pass copies the lines it reads to a temporary file, and the second pass reads them back
+        from there instead of holding the program in memory.
+
+        @param lines: An iterable of assembly lines, e.g. sys.stdin.
+        @param stream: The file-like object to write to (binary if binary is set, text otherwise).
+        @param binary: Write packed 16-bit words instead of .hack text.
+        @param symbolTable: The symbol table to populate; a fresh one is used if omitted.
+        @param chunk_size: The number of instructions encoded between writes.
+        @return: The populated symbol table.
+        """
+        if symbolTable is None:
+            symbolTable = SymbolTable()
+        with tempfile.TemporaryFile("w+") as spill:
+            # First pass, spilling every line as it goes by
+            def spilled(lines):
+                write = spill.write
+                for line in lines:
+                    write(line)
+                    yield line
+            self.buildSymbolTable(spilled(lines), symbolTable)
+            # Second pass
+            spill.seek(0)
+            self.writeChunks(spill, stream, binary, symbolTable, chunk_size)
+        return symbolTable
+
+    def writeChunks(self, lines, stream, binary, symbolTable, chunk_size):
+        """
+        Second pass of assembleFile/assembleStream; encodes and writes chunk_size instructions at a time.
+        """
+        write = self.writeBinary if binary else self.writeHack
+        records = self.iterInstructions(lines)
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                break
+            write(self.generateWords(chunk, symbolTable), stream)
+
+    def assembleParallel(self, source, symbolTable=None, workers=None, chunks_per_worker=4):
+        """
+        Assembles a whole program using a process pool; the result matches generateWords bit for bit.
+
+        The source is split into line-aligned chunks. Workers first count each chunk's
+        instructions and collect its labels and variables in first-use order; these are
+        merged here into one symbol table (a prefix sum gives each chunk's base address).
+        The frozen table is then shipped back to the workers to encode the chunks.
+
+        @param source: The complete assembly program as a string.
+        @param symbolTable: The symbol table to populate (it is frozen afterwards); a fresh one is used if omitted.
+        @param workers: The number of worker processes (defaults to the CPU count).
+        @param chunks_per_worker: How many chunks to cut per worker, for load balancing.
+        @return: An array('H') holding one 16-bit word per instruction.
+        """
+        if symbolTable is None:
+            symbolTable = SymbolTable()
+        if workers is None:
+            workers = os.cpu_count() or 1
+        chunks = splitSource(source, workers * chunks_per_worker)
+
+        if workers > 1 and len(chunks) > 1:
+            executor = ProcessPoolExecutor(workers)
+            run = executor.map
+        else:
+            executor = None
+            run = map
+        try:
+            # First pass: per-chunk counts, labels and variables
+            scans = list(run(_scanChunk, chunks))
+
+            self.mergeScans(scans, symbolTable)
+            symbolTable.freeze()
+
+            # Second pass: encode every chunk against the now complete, read-only table
+            words = array('H')
+            for encoded in run(_encodeChunk, chunks, [symbolTable] * len(chunks)):
+                words.frombytes(encoded)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        return words
+
+    def mergeScans(self, scans, symbolTable):
+        """
+        Builds the symbol table from per-chunk first-pass results, exactly as the sequential passes would.
+
+        @param scans: Sequences starting with (instruction count, labels, variables), in source order, as returned by _scanChunk.
+        @param symbolTable: The symbol table to populate.
+        """
+        # merge labels in source order, offsetting each chunk by the instructions before it
+        base_address = 0
+        for scan in scans:
+            for label, offset in scan[1]:
+                if label not in symbolTable:
+                    symbolTable.addLabel(label, base_address + offset)
+            base_address += scan[0]
+        # then allocate variables in the order the sequential second pass would meet them
+        for scan in scans:
+            for variable in scan[2]:
+                if variable not in symbolTable:
+                    symbolTable.addVariable(variable)
+
+    def assembleIncremental(self, path, cache=None, symbolTable=None):
+        """
+        Assembles a file, re-using the work cached from the previous run wherever possible.
+
+        The source is cut into blocks at labels. A block is re-scanned only if its text
+        changed, and re-encoded only if its text changed or a symbol it references now
+        has a different address. The output always matches generateWords.
+
+        @param path: The path of the .asm file to assemble.
+        @param cache: The AssemblyCache to use; defaults to one stored next to the source.
+        @param symbolTable: The symbol table to populate (it is frozen afterwards); a fresh one is used if omitted.
+        @return: An array('H') holding one 16-bit word per instruction.
+        """
+        if cache is None:
+            cache = AssemblyCache(path + '.asmcache')
+        if symbolTable is None:
+            symbolTable = SymbolTable()
+        with open(path, "r") as a_file:
+            source = a_file.read()
+        cache.resetStats()
+
+        # fast path: nothing changed since the last run
+        source_hash = hashBlock(source)
+        if cache.source_hash == source_hash and cache.labels is not None:
+            symbolTable.preload(cache.labels, LABEL)
+            symbolTable.preload(cache.variables, VARIABLE)
+            cache.blocks_total = len(cache.blocks)
+            return array('H', cache.words)
+
+        chunks = splitBlocks(source)
+        hashes = [hashBlock(text) for line_number, text in chunks]
+        old_blocks = cache.blocks
+        entries = []
+        # First pass: only blocks with new text need scanning
+        for chunk, block_hash in zip(chunks, hashes):
+            entry = old_blocks.get(block_hash)
+            if entry is None:
+                count, labels, variables = _scanChunk(chunk)
+                # words/bindings are filled in when the block is encoded
+                entry = [count, labels, variables, None, None]
+                cache.blocks_scanned += 1
+            entries.append(entry)
+        self.mergeScans(entries, symbolTable)
+        symbolTable.freeze()
+
+        # Second pass: re-encode blocks whose text changed or whose symbols moved
+        getSymbol = symbolTable.getSymbol
+        words = array('H')
+        new_blocks = {}
+        for chunk, block_hash, entry in zip(chunks, hashes, entries):
+            bindings = [getSymbol(variable) for variable in entry[2]]
+            if entry[4] != bindings:
+                entry = [entry[0], entry[1], entry[2], _encodeChunk(chunk, symbolTable), bindings]
+                cache.blocks_encoded += 1
+            words.frombytes(entry[3])
+            new_blocks[block_hash] = entry
+
+        cache.update(source_hash, new_blocks, words, symbolTable)
+        cache.save()
+        return words
 
     def parseInstructionType(self, instruction):
         """
@@ -249,22 +1149,10 @@ class Assembler:
         @param dest: The destination of the instruction
         @return: A String containing the 3 binary dest bits that correspond to the given dest value.
         """
-        if dest == 'M':
-            return '001'
-        elif dest == 'D':
-            return '010'
-        elif dest == 'MD':
-            return '011'
-        elif dest == 'A':
-            return '100'
-        elif dest == 'AM':
-            return '101'
-        elif dest == 'AD':
-            return '110'
-        elif dest == 'AMD':
-            return '111'
-        else:
-            return '000'
+        bits = dest_table.get(dest)
+        if bits is None:
+            raise AssemblerError("Invalid dest field '{}'".format(dest))
+        return bits
     
 
     def translateJump(self, jump):
@@ -274,24 +1162,12 @@ class Assembler:
         @param jump: The jump condition for the instruction
         @return: A String containing the 3 binary jump bits that correspond to the given jump value.
         """
-        if jump == 'JGT':
-            return '001'
-        elif jump == 'JEQ':
-            return '010'
-        elif jump == 'JGE':
-            return '011'
-        elif jump == 'JLT':
-            return '100'
-        elif jump == 'JNE':
-            return '101'
-        elif jump == 'JLE':
-            return '110'
-        elif jump == 'JMP':
-            return '111'
-        else:
-            return '000'
-    
+        bits = jump_table.get(jump)
+        if bits is None:
+            raise AssemblerError("Invalid jump field '{}'".format(jump))
+        return bits
     
+
     def translateComp(self, comp):
         """
         Generates the binary bits of the computation/op-code part of a C-instruction
@@ -299,66 +1175,12 @@ class Assembler:
         @param comp: The computation/op-code for the instruction
         @return: A String containing the 7 binary computation/op-code bits that correspond to the given comp value.
         """
-        if comp == '0':
-            return '0101010'
-        elif comp == '1':
-            return '0111111'
-        elif comp == '-1':
-            return '0111010'
-        elif comp == 'D':
-            return '0001100'
-        elif comp == 'A':
-            return '0110000'
-        elif comp == '!D':
-            return '0001101'
-        elif comp == '!A':
-            return '0110001'
-        elif comp == '-D':
-            return '0001111'
-        elif comp == '-A':
-            return '0110011'
-        elif comp == 'D+1':
-            return '0011111'
-        elif comp == 'A+1':
-            return '0110111'
-        elif comp == 'D-1':
-            return '0001110'
-        elif comp == 'A-1':
-            return '0110010'
-        elif comp == 'D+A':
-            return '0000010'
-        elif comp == 'D-A':
-            return '0010011'
-        elif comp == 'A-D':
-            return '0000111'
-        elif comp == 'D&A':
-            return '0000000'
-        elif comp == 'D|A':
-            return '0010101'
-        elif comp == 'M':
-            return '1110000'
-        elif comp == '!M':
-            return '1110001'
-        elif comp == '-M':
-            return '1110011'
-        elif comp == 'M+1':
-            return '1110111'
-        elif comp == 'M-1':
-            return '1110010'
-        elif comp == 'D+M':
-            return '1000010'
-        elif comp == 'D-M':
-            return '1010011'
-        elif comp == 'M-D':
-            return '1000111'
-        elif comp == 'D&M':
-            return '1000000'
-        elif comp == 'D|M':
-            return '1010101'
-        else:
-            return '0000000'
-    
+        bits = comp_table.get(comp)
+        if bits is None:
+            raise AssemblerError("Invalid comp field '{}'".format(comp))
+        return bits
     
+
     def translateSymbol(self, symbol, symbolTable):
         """
         Generates the binary bits for an A-instruction, parsing the value, or looking up the symbol name.
@@ -373,9 +1195,8 @@ class Assembler:
         except ValueError:
             # if not an integer, check if in the symbol table
             if symbol not in symbolTable:
-                # if not add it with the next variable adddress and incremnte next_variable_address
-                symbolTable.addSymbol(symbol, symbolTable.next_variable_address)
-                symbolTable.next_variable_address += 1
+                # if not allocate it the next variable address
+                symbolTable.addVariable(symbol)
             # get address associated with the symbol
             address = symbolTable.getSymbol(symbol)
 
@@ -390,24 +1211,310 @@ class Assembler:
         return format(address, '015b')
     
 
+def splitSource(source, count):
+    """
+    Splits assembly source into roughly equal chunks on line boundaries.
+
+    @param source: The complete assembly program as a string.
+    @param count: The desired number of chunks.
+    @return: A list of (first line number, chunk text) tuples.
+    """
+    chunks = []
+    target = max(1, len(source) // max(1, count))
+    start = 0
+    line_number = 1
+    while start < len(source):
+        end = source.find('\n', min(start + target, len(source) - 1))
+        end = len(source) if end == -1 else end + 1
+        chunks.append((line_number, source[start:end]))
+        line_number += source.count('\n', start, end)
+        start = end
+    return chunks
+
+
+def splitBlocks(source, max_lines=4096):
+    """
+    Splits assembly source into blocks that start at labels, for incremental assembly.
+
+    Cutting at labels means an edit only changes the text of the block it is in.
+    Label-free runs longer than max_lines are cut further.
+
+    @param source: The complete assembly program as a string.
+    @param max_lines: The maximum number of lines per block.
+    @return: A list of (first line number, block text) tuples.
+    """
+    starts = [0]
+    for match in LABEL_LINE.finditer(source):
+        if match.start() != 0:
+            starts.append(match.start())
+    starts.append(len(source))
+
+    blocks = []
+    line_number = 1
+    for start, end in zip(starts, starts[1:]):
+        while start < end:
+            # find the end of at most max_lines lines, without splitting the whole source
+            cut = start
+            for _ in range(max_lines):
+                cut = source.find('\n', cut, end)
+                if cut == -1:
+                    cut = end
+                    break
+                cut += 1
+            blocks.append((line_number, source[start:cut]))
+            line_number += source.count('\n', start, cut)
+            start = cut
+    return blocks
+
+
+def hashBlock(text):
+    # a short digest is plenty to tell blocks of one file apart
+    return hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+
+# start of every line that holds a label, e.g. "(LOOP)" or "    (END)"
+LABEL_LINE = re.compile(r'^[ \t]*\(', re.MULTILINE)
+
+
+# per-process assembler used by the parallel workers
+_worker_assembler = None
+
+
+def _workerAssembler():
+    global _worker_assembler
+    if _worker_assembler is None:
+        _worker_assembler = Assembler()
+    return _worker_assembler
+
+
+def _chunkInstructions(assembler, chunk):
+    # tokenizes a chunk, numbering lines from the chunk's position in the whole source
+    first_line, text = chunk
+    parseLine = assembler.parseLine
+    for line_number, line in enumerate(text.splitlines(), first_line):
+        record = parseLine(line, line_number)
+        if record is not None:
+            yield record
+
+
+def _scanChunk(chunk):
+    """
+    Parallel first pass over one chunk.
+    @return: (instruction count, [(label, offset within chunk)], [variables in first-use order])
+    """
+    count = 0
+    labels = []
+    variables = {}
+    for instruction in _chunkInstructions(_workerAssembler(), chunk):
+        if instruction.kind == 'L_INSTRUCTION':
+            labels.append((instruction.symbol, count))
+            continue
+        count += 1
+        if instruction.kind == 'A_INSTRUCTION' and not isinstance(instruction.symbol, int):
+            # a dict keeps first-use order while dropping repeats
+            variables[instruction.symbol] = None
+    return count, labels, list(variables)
+
+
+def _encodeChunk(chunk, symbolTable):
+    """
+    Parallel second pass over one chunk against a complete, frozen symbol table.
+    @return: The chunk's machine code as native-endian packed 16-bit words.
+    """
+    assembler = _workerAssembler()
+    return assembler.generateWords(_chunkInstructions(assembler, chunk), symbolTable).tobytes()
+
+
+def expandSources(patterns):
+    """
+    Expands directories, glob patterns and plain paths into a list of .asm files.
+
+    @param patterns: An iterable of directory paths, glob patterns or file paths.
+    @return: A list of unique .asm paths, in argument order and sorted within each directory/glob.
+    """
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths.extend(sorted(glob.glob(os.path.join(pattern, '*.asm'))))
+        elif glob.has_magic(pattern):
+            paths.extend(sorted(glob.glob(pattern)))
+        else:
+            paths.append(pattern)
+    # drop duplicates while keeping the first occurrence
+    return list(dict.fromkeys(paths))
+
+
+def _assembleOne(path, binary):
+    """
+    Batch worker; assembles one file next to its source.
+    @return: (source path, output path, seconds taken, error message or None)
+    """
+    start = time.perf_counter()
+    out_path = os.path.splitext(path)[0] + ('.bin' if binary else '.hack')
+    try:
+        with open(out_path, "wb" if binary else "w") as out_file:
+            _workerAssembler().assembleFile(path, out_file, binary)
+    except (AssemblerError, OSError) as e:
+        # don't leave a truncated output behind
+        if os.path.exists(out_path):
+            os.remove(out_path)
+        return path, out_path, time.perf_counter() - start, getattr(e, 'message', None) or str(e)
+    return path, out_path, time.perf_counter() - start, None
+
+
+def assembleBatch(paths, workers=None, binary=False):
+    """
+    Assembles many files concurrently, writing each .hack (or .bin) file next to its source.
+
+    Each file gets its own symbol table, so the output is identical to assembling
+    the files one at a time.
+
+    @param paths: The .asm files to assemble.
+    @param workers: The number of worker processes (defaults to the CPU count).
+    @param binary: Write packed 16-bit words instead of .hack text.
+    @return: A list of (source path, output path, seconds taken, error message or None), in input order.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(workers) as executor:
+            # small files make per-task overhead dominant, so hand them out in batches
+            chunksize = max(1, len(paths) // (workers * 4))
+            return list(executor.map(_assembleOne, paths, [binary] * len(paths), chunksize=chunksize))
+    return [_assembleOne(path, binary) for path in paths]
+
+
 # A quick-and-dirty parser when run as a standalone script.
 if __name__ == "__main__":
-    import sys
-    if(len(sys.argv) > 1):
-        instructions = []
-        # Open file
-        with open(sys.argv[1], "r") as a_file:
-            # Read line-by-line, skip comments and empty line
-            for line in a_file:
-                if line[0] != '/' and line[0] != "\n":
-                    instructions.append(line.strip())
-        assembler = Assembler()
-        symbolTable = SymbolTable()
-            # print(instructions)
-            # print(symbolTable)
-        # First pass
-        assembler.buildSymbolTable(instructions,symbolTable)
-        # Second pass
-        code = assembler.generateMachineCode(instructions,symbolTable)
-        # Print output
-        print(code)
+    import argparse
+    arg_parser = argparse.ArgumentParser(description='Assemble a Hack .asm file, printing the machine code to stdout.')
+    arg_parser.add_argument('files', nargs='+', metavar='file',
+                            help="the .asm file to assemble, or '-' for stdin; several files, directories or globs "
+                                 "imply --batch")
+    arg_parser.add_argument('--batch', action='store_true',
+                            help='assemble every given file concurrently, writing each .hack next to its source')
+    arg_parser.add_argument('-o', '--output', help="write the machine code to this file instead of stdout ('-')")
+    arg_parser.add_argument('--binary', action='store_true', help='emit packed big-endian 16-bit words instead of .hack text')
+    arg_parser.add_argument('--stream', action='store_true', help='assemble in bounded memory by reading the file twice')
+    arg_parser.add_argument('--incremental', action='store_true',
+                            help='reuse unchanged blocks from the cache left by the previous run (FILE.asmcache)')
+    arg_parser.add_argument('-j', '--jobs', type=int, help='assemble in parallel with this many worker processes')
+    arg_parser.add_argument('--numpy', action='store_true',
+                            help='use the NumPy backend for the second pass (pure Python if NumPy is missing)')
+    arg_parser.add_argument('-O', '--optimize', action='store_true',
+                            help='apply peephole optimizations before assembling')
+    arg_parser.add_argument('--source-map', metavar='FILE',
+                            help='write the source line of every ROM address to FILE, one "address<TAB>line" per line')
+    arg_parser.add_argument('--stats', action='store_true', help='print C-instruction cache statistics to stderr')
+    args = arg_parser.parse_args()
+    # several files, a directory or a glob pattern are assembled in batch mode
+    batch = args.batch or len(args.files) > 1 or os.path.isdir(args.files[0]) or glob.has_magic(args.files[0])
+    if args.optimize and (args.stream or args.incremental or args.jobs or batch):
+        arg_parser.error('--optimize cannot be combined with --stream, --incremental, --jobs or batch mode')
+    if args.source_map and (args.stream or args.incremental or args.jobs):
+        arg_parser.error('--source-map cannot be combined with --stream, --incremental or --jobs')
+    if args.numpy and (args.stream or args.incremental or args.jobs):
+        arg_parser.error('--numpy cannot be combined with --stream, --incremental or --jobs')
+    if batch and (args.source_map or args.stats or args.numpy or args.incremental):
+        arg_parser.error('--source-map, --stats, --numpy and --incremental cannot be used in batch mode')
+    if '-' in args.files and (len(args.files) > 1 or args.batch or args.incremental):
+        arg_parser.error("'-' (stdin) cannot be combined with other files, --batch or --incremental")
+
+    if batch:
+        if args.output:
+            arg_parser.error('--output cannot be used when assembling several files')
+        start = time.perf_counter()
+        results = assembleBatch(expandSources(args.files), args.jobs, args.binary)
+        failures = 0
+        for path, out_path, seconds, error in results:
+            if error is None:
+                print('{} -> {} ({:.3f}s)'.format(path, out_path, seconds))
+            else:
+                failures += 1
+                print('{}: FAILED: {} ({:.3f}s)'.format(path, error, seconds))
+        print('{} files assembled, {} failed in {:.3f}s'.format(len(results) - failures, failures,
+                                                                time.perf_counter() - start))
+        sys.exit(1 if failures else 0)
+    args.file = args.files[0]
+
+    assembler = Assembler()
+    symbolTable = SymbolTable()
+    out_file = None
+    if args.output and args.output != '-':
+        # written next to the target and moved over it on success, so a failed run keeps the previous output
+        out_file = tempfile.NamedTemporaryFile("wb" if args.binary else "w", delete=False, suffix='.tmp',
+                                               dir=os.path.dirname(os.path.abspath(args.output)),
+                                               prefix=os.path.basename(args.output) + '.')
+        # give it the permissions open() would have, rather than the private ones of a temporary file
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(out_file.name, 0o666 & ~umask)
+    out_stream = out_file or (sys.stdout.buffer if args.binary else sys.stdout)
+    # the program is read from stdin as it arrives, unless the whole of it is needed up front
+    streaming_stdin = args.file == '-' and not (args.optimize or args.jobs or args.source_map or args.numpy)
+    # open() takes stdin's file descriptor as well as a path
+    source_path = sys.stdin.fileno() if args.file == '-' else args.file
+    succeeded = False
+    try:
+        if streaming_stdin:
+            # The first pass spills stdin to a temporary file that the second pass re-reads
+            assembler.assembleStream(sys.stdin, out_stream, args.binary, symbolTable)
+        elif args.stream:
+            # Both passes stream the file; nothing but the symbol table is kept
+            assembler.assembleFile(args.file, out_stream, args.binary, symbolTable)
+        elif args.incremental:
+            # Only changed blocks (or those whose symbols moved) are re-assembled
+            cache = AssemblyCache(args.file + '.asmcache')
+            words = assembler.assembleIncremental(args.file, cache, symbolTable)
+            if args.binary:
+                assembler.writeBinary(words, out_stream)
+            else:
+                assembler.writeHack(words, out_stream)
+            if args.stats:
+                print(cache.stats(), file=sys.stderr)
+        elif args.jobs:
+            # Both passes run chunk-wise in a process pool
+            with open(source_path, "r") as a_file:
+                words = assembler.assembleParallel(a_file.read(), symbolTable, args.jobs)
+            if args.binary:
+                assembler.writeBinary(words, out_stream)
+            else:
+                assembler.writeHack(words, out_stream)
+        else:
+            # Open file and tokenize every line once
+            with open(source_path, "r") as a_file:
+                instructions = assembler.parseInstructions(a_file)
+            if args.optimize:
+                optimizer = PeepholeOptimizer()
+                instructions = assembler.optimize(instructions, optimizer)
+                if args.stats:
+                    print(optimizer.stats(), file=sys.stderr)
+            # First pass
+            assembler.buildSymbolTable(instructions,symbolTable)
+            # Second pass
+            if args.numpy:
+                words = assembler.generateWordsNumpy(instructions,symbolTable)
+            else:
+                words = assembler.generateWords(instructions,symbolTable)
+            # Write output
+            if args.binary:
+                assembler.writeBinary(words, out_stream)
+            else:
+                assembler.writeHack(words, out_stream)
+            if args.source_map:
+                with open(args.source_map, "w") as map_file:
+                    for address, line in enumerate(assembler.sourceMap(instructions)):
+                        map_file.write('{}\t{}\n'.format(address, line))
+        succeeded = True
+    except AssemblerError as e:
+        sys.exit('{}: {}'.format(args.file, e.message))
+    finally:
+        if out_file:
+            out_file.close()
+            if succeeded:
+                os.replace(out_file.name, args.output)
+            else:
+                os.remove(out_file.name)
+    if args.stats:
+        print(assembler.encoder.stats(), file=sys.stderr)
+        print(symbolTable.memoryReport(), file=sys.stderr)
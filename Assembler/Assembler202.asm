@@ -1,8 +1,10 @@
 // Test program for symbol table with variables
 // This program calculates the value of y = 3x + 4
 
+@5
+D=A
 @x
-M=5
+M=D
 @x
 D=M
 @3
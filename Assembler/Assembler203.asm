@@ -3,8 +3,10 @@
 
     @fact
     M=1
+    @5
+    D=A
     @counter
-    M=5
+    M=D
 (LOOP)
     @fact
     D=M
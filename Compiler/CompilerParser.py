@@ -1,61 +1,431 @@
 """
-This code provides a basic framework for a parser named `CompilerParser` designed to transform a sequence of tokens into a parse tree. The tokens are expected to represent syntactical constructs in some programming language, and the parser is intended to capture the hierarchical structure of these constructs in the form of a tree.
+This code provides a parser named `CompilerParser` that transforms a sequence of Jack tokens into a parse tree. The parser captures the hierarchical structure of the Jack grammar in the form of a tree.
 
 Classes and Main Functionalities:
-1. `ParseException`: 
+1. `ParseException`:
     - A custom exception class raised when an encountered token does not match the expected syntax during parsing.
 
 2. `CompilerParser`:
-    - `__init__(self, tokens)`: Initializes the parser with a list of tokens and sets the current token index to 0.
+    - `__init__(self, tokens)`: Initializes the parser with a list of tokens (or a `TokenStream`) and sets the current token index to 0.
     - `next(self)`: Advances the current token index to point to the next token.
-    - `current(self)`: Returns the current token based on the current token index.
-    - `have(self, expectedType, expectedValue)`: Checks if the current token matches the expected type and value.
+    - `current(self)`: Returns the current token based on the current token index, or None once every token is consumed.
+    - `have(self, expectedType, expectedValue)`: Checks if the current token matches the expected type and value (any value if None). The tokens are kept in a compact `TokenStream`, so this is two array lookups.
     - `mustBe(self, expectedType, expectedValue)`: Verifies if the current token matches the expected type and value. If true, it returns the current token and advances to the next one; otherwise, raises a ParseException.
-    - There are other stub methods like `compileProgram`, `compileClass`, etc., which are placeholders intended to be filled out with logic for parsing specific constructs.
+    - `compileProgram`, `compileClass`, `compileClassVarDec`, `compileSubroutine`, `compileParameterList`, `compileSubroutineBody`, `compileVarDec`, `compileStatements`, `compileLet`, `compileIf`, `compileWhile`, `compileDo`, `compileReturn`, `compileExpression`, `compileTerm` and `compileExpressionList`: Parse one construct of the Jack grammar each and return its ParseTree.
+
+The parser is predictive: every choice between alternatives (which statement, whether a list goes on, which kind of term) is made by looking the current token's (type, value) up in the FIRST-set tables below, never by trying an alternative and backing out of it. Each token is examined a constant number of times, so parsing takes time linear in the number of tokens. The one place Jack needs a second token of lookahead is a term starting with an identifier, where the token after it tells a variable, an array entry and a subroutine call apart.
 
 Sample Usage:
 In the `__main__` section, an example usage is provided. A list of tokens representing a basic class structure in some programming language is created. This list is then passed to an instance of the `CompilerParser` which attempts to parse the tokens and generate a parse tree. If any errors are encountered during parsing, a message indicating a parsing error is printed.
-"""
 
+To use the parser as a standalone script:
+$ python CompilerParser.py                       (parses the example above)
+$ python CompilerParser.py Main.jack             (prints the parse tree of each file)
+$ python CompilerParser.py --xml Main.jack       (prints it in the nand2tetris XML format instead)
+$ python CompilerParser.py --benchmark           (times parsing and printing synthetic classes of growing size)
+"""
 
 
 from ParseTree import *
 
+# the TokenStream codes of the Jack token types
+KEYWORD, SYMBOL, INTEGER_CONSTANT, STRING_CONSTANT, IDENTIFIER = range(len(token_types))
+
+# FIRST sets of the grammar, keyed by (type code, value); a value of None stands for any token of that type.
+# The parser only ever compares the current token against these, so every decision is one or two set lookups.
+class_var_dec_first = frozenset([(KEYWORD, 'static'), (KEYWORD, 'field')])
+subroutine_first = frozenset([(KEYWORD, 'constructor'), (KEYWORD, 'function'), (KEYWORD, 'method')])
+type_first = frozenset([(KEYWORD, 'int'), (KEYWORD, 'char'), (KEYWORD, 'boolean'), (IDENTIFIER, None)])
+return_type_first = type_first | {(KEYWORD, 'void')}
+op_first = frozenset((SYMBOL, op) for op in '+-*/&|<>=')
+
+# FIRST sets that also choose the alternative: each maps to the method parsing it (resolved below the class)
+statement_first = {
+    (KEYWORD, 'let'): 'compileLet',
+    (KEYWORD, 'if'): 'compileIf',
+    (KEYWORD, 'while'): 'compileWhile',
+    (KEYWORD, 'do'): 'compileDo',
+    (KEYWORD, 'return'): 'compileReturn',
+}
+term_first = {
+    (INTEGER_CONSTANT, None): 'termToken',
+    (STRING_CONSTANT, None): 'termToken',
+    (KEYWORD, 'true'): 'termToken',
+    (KEYWORD, 'false'): 'termToken',
+    (KEYWORD, 'null'): 'termToken',
+    (KEYWORD, 'this'): 'termToken',
+    (IDENTIFIER, None): 'termIdentifier',
+    (SYMBOL, '('): 'termParenthesized',
+    (SYMBOL, '-'): 'termUnary',
+    (SYMBOL, '~'): 'termUnary',
+}
+
+
 class CompilerParser:
 
     def __init__(self, tokens):
         """
         Constructor for the CompilerParser
-        @param tokens A list of tokens to be parsed
+        @param tokens A list of tokens to be parsed, or a TokenStream (e.g. from JackTokenizer.stream())
         """
+        if isinstance(tokens, TokenStream):
+            self.stream = tokens
+        else:
+            # checks run against the compact copy; the caller's Token objects are still what mustBe returns
+            self.stream = TokenStream.fromTokens(tokens)
         self.tokens = tokens
         self.current_idx = 0
+        # the stream's arrays, bound once for have/mustBe
+        self.types = self.stream.types
+        self.values = self.stream.values
+        self.type_codes = self.stream.type_codes
+        self.count = len(self.types)
+
+    def compileProgram(self):
+        """
+        Generates a parse tree for a single program, which must be exactly one class
+        @return a ParseTree that represents the program
+        """
+        if not self.have('keyword', 'class'):
+            raise ParseException(self.describeUnexpected('a class'))
+        tree = self.compileClass()
+        if self.current_idx < self.count:
+            raise ParseException(self.describeUnexpected('the end of the input'))
+        return tree
+
+    def compileClass(self):
+        """
+        Generates a parse tree for a class:
+        'class' className '{' classVarDec* subroutine* '}'
+        @return a ParseTree that represents a class
+        """
+        tree = ParseTree('class')
+        tree.addChild(self.mustBe('keyword', 'class'))
+        tree.addChild(self.mustBe('identifier'))
+        tree.addChild(self.mustBe('symbol', '{'))
+        while self.startsWith(class_var_dec_first):
+            tree.addChild(self.compileClassVarDec())
+        while self.startsWith(subroutine_first):
+            tree.addChild(self.compileSubroutine())
+        tree.addChild(self.mustBe('symbol', '}'))
+        return tree
+
+    def compileClassVarDec(self):
+        """
+        Generates a parse tree for a static variable or field declaration:
+        ('static' | 'field') type varName (',' varName)* ';'
+        @return a ParseTree that represents a static variable or field declaration
+        """
+        tree = ParseTree('classVarDec')
+        tree.addChild(self.mustBeIn(class_var_dec_first, 'static or field'))
+        self.compileNames(tree)
+        return tree
+
+    def compileSubroutine(self):
+        """
+        Generates a parse tree for a method, function, or constructor:
+        ('constructor' | 'function' | 'method') ('void' | type) subroutineName '(' parameterList ')' subroutineBody
+        @return a ParseTree that represents the method, function, or constructor
+        """
+        tree = ParseTree('subroutine')
+        tree.addChild(self.mustBeIn(subroutine_first, 'constructor, function or method'))
+        tree.addChild(self.mustBeIn(return_type_first, 'a type or void'))
+        tree.addChild(self.mustBe('identifier'))
+        tree.addChild(self.mustBe('symbol', '('))
+        tree.addChild(self.compileParameterList())
+        tree.addChild(self.mustBe('symbol', ')'))
+        tree.addChild(self.compileSubroutineBody())
+        return tree
+
+    def compileParameterList(self):
+        """
+        Generates a parse tree for a subroutine's parameters, which may be none:
+        (type varName (',' type varName)*)?
+        @return a ParseTree that represents a subroutine's parameters
+        """
+        tree = ParseTree('parameterList')
+        if self.startsWith(type_first):
+            tree.addChild(self.consume())
+            tree.addChild(self.mustBe('identifier'))
+            while self.have('symbol', ','):
+                tree.addChild(self.consume())
+                tree.addChild(self.mustBeIn(type_first, 'a type'))
+                tree.addChild(self.mustBe('identifier'))
+        return tree
+
+    def compileSubroutineBody(self):
+        """
+        Generates a parse tree for a subroutine's body:
+        '{' varDec* statements '}'
+        @return a ParseTree that represents a subroutine's body
+        """
+        tree = ParseTree('subroutineBody')
+        tree.addChild(self.mustBe('symbol', '{'))
+        while self.have('keyword', 'var'):
+            tree.addChild(self.compileVarDec())
+        tree.addChild(self.compileStatements())
+        tree.addChild(self.mustBe('symbol', '}'))
+        return tree
+
+    def compileVarDec(self):
+        """
+        Generates a parse tree for a variable declaration:
+        'var' type varName (',' varName)* ';'
+        @return a ParseTree that represents a var declaration
+        """
+        tree = ParseTree('varDec')
+        tree.addChild(self.mustBe('keyword', 'var'))
+        self.compileNames(tree)
+        return tree
+
+    def compileNames(self, tree):
+        """
+        Adds the part declarations share to their tree:
+        type varName (',' varName)* ';'
+        @param tree The declaration's ParseTree
+        """
+        tree.addChild(self.mustBeIn(type_first, 'a type'))
+        tree.addChild(self.mustBe('identifier'))
+        while self.have('symbol', ','):
+            tree.addChild(self.consume())
+            tree.addChild(self.mustBe('identifier'))
+        tree.addChild(self.mustBe('symbol', ';'))
+
+    def compileStatements(self):
+        """
+        Generates a parse tree for a series of statements, which may be none:
+        (letStatement | ifStatement | whileStatement | doStatement | returnStatement)*
+        @return a ParseTree that represents the series of statements
+        """
+        tree = ParseTree('statements')
+        statement = self.lookup(statement_first)
+        while statement is not None:
+            tree.addChild(statement(self))
+            statement = self.lookup(statement_first)
+        return tree
+
+    def compileLet(self):
+        """
+        Generates a parse tree for a let statement:
+        'let' varName ('[' expression ']')? '=' expression ';'
+        @return a ParseTree that represents the statement
+        """
+        tree = ParseTree('letStatement')
+        tree.addChild(self.mustBe('keyword', 'let'))
+        tree.addChild(self.mustBe('identifier'))
+        if self.have('symbol', '['):
+            tree.addChild(self.consume())
+            tree.addChild(self.compileExpression())
+            tree.addChild(self.mustBe('symbol', ']'))
+        tree.addChild(self.mustBe('symbol', '='))
+        tree.addChild(self.compileExpression())
+        tree.addChild(self.mustBe('symbol', ';'))
+        return tree
+
+    def compileIf(self):
+        """
+        Generates a parse tree for an if statement:
+        'if' '(' expression ')' '{' statements '}' ('else' '{' statements '}')?
+        @return a ParseTree that represents the statement
+        """
+        tree = ParseTree('ifStatement')
+        tree.addChild(self.mustBe('keyword', 'if'))
+        self.compileBlock(tree)
+        if self.have('keyword', 'else'):
+            tree.addChild(self.consume())
+            tree.addChild(self.mustBe('symbol', '{'))
+            tree.addChild(self.compileStatements())
+            tree.addChild(self.mustBe('symbol', '}'))
+        return tree
+
+    def compileWhile(self):
+        """
+        Generates a parse tree for a while statement:
+        'while' '(' expression ')' '{' statements '}'
+        @return a ParseTree that represents the statement
+        """
+        tree = ParseTree('whileStatement')
+        tree.addChild(self.mustBe('keyword', 'while'))
+        self.compileBlock(tree)
+        return tree
+
+    def compileBlock(self, tree):
+        """
+        Adds the condition and body if and while statements share to their tree:
+        '(' expression ')' '{' statements '}'
+        @param tree The statement's ParseTree
+        """
+        tree.addChild(self.mustBe('symbol', '('))
+        tree.addChild(self.compileExpression())
+        tree.addChild(self.mustBe('symbol', ')'))
+        tree.addChild(self.mustBe('symbol', '{'))
+        tree.addChild(self.compileStatements())
+        tree.addChild(self.mustBe('symbol', '}'))
+
+    def compileDo(self):
+        """
+        Generates a parse tree for a do statement:
+        'do' subroutineCall ';'
+        @return a ParseTree that represents the statement
+        """
+        tree = ParseTree('doStatement')
+        tree.addChild(self.mustBe('keyword', 'do'))
+        tree.addChild(self.mustBe('identifier'))
+        self.compileCall(tree)
+        tree.addChild(self.mustBe('symbol', ';'))
+        return tree
+
+    def compileReturn(self):
+        """
+        Generates a parse tree for a return statement:
+        'return' expression? ';'
+        @return a ParseTree that represents the statement
+        """
+        tree = ParseTree('returnStatement')
+        tree.addChild(self.mustBe('keyword', 'return'))
+        if self.lookup(term_first) is not None:
+            tree.addChild(self.compileExpression())
+        tree.addChild(self.mustBe('symbol', ';'))
+        return tree
+
+    def compileExpression(self):
+        """
+        Generates a parse tree for an expression:
+        term (op term)*
+        @return a ParseTree that represents the expression
+        """
+        tree = ParseTree('expression')
+        tree.addChild(self.compileTerm())
+        while self.startsWith(op_first):
+            tree.addChild(self.consume())
+            tree.addChild(self.compileTerm())
+        return tree
+
+    def compileTerm(self):
+        """
+        Generates a parse tree for a term: a constant, variable, array entry, subroutine call,
+        parenthesized expression or unary operation
+        @return a ParseTree that represents the term
+        """
+        term = self.lookup(term_first)
+        if term is None:
+            raise ParseException(self.describeUnexpected('a term'))
+        tree = ParseTree('term')
+        term(self, tree)
+        return tree
+
+    def termToken(self, tree):
+        """
+        Adds a term that is a single token: an integer, string or keyword constant
+        @param tree The term's ParseTree
+        """
+        tree.addChild(self.consume())
 
-    # ... [the other methods remain unchanged]
+    def termParenthesized(self, tree):
+        """
+        Adds a term of the form: '(' expression ')'
+        @param tree The term's ParseTree
+        """
+        tree.addChild(self.consume())
+        tree.addChild(self.compileExpression())
+        tree.addChild(self.mustBe('symbol', ')'))
+
+    def termUnary(self, tree):
+        """
+        Adds a term of the form: ('-' | '~') term
+        @param tree The term's ParseTree
+        """
+        tree.addChild(self.consume())
+        tree.addChild(self.compileTerm())
+
+    def termIdentifier(self, tree):
+        """
+        Adds a term starting with an identifier: varName, varName '[' expression ']' or a subroutineCall.
+        The token after the identifier decides which.
+        @param tree The term's ParseTree
+        """
+        tree.addChild(self.consume())
+        index = self.current_idx
+        if index < self.count and self.types[index] == SYMBOL:
+            value = self.values[index]
+            if value == '[':
+                tree.addChild(self.consume())
+                tree.addChild(self.compileExpression())
+                tree.addChild(self.mustBe('symbol', ']'))
+            elif value == '(' or value == '.':
+                self.compileCall(tree)
+
+    def compileCall(self, tree):
+        """
+        Adds the rest of a subroutine call whose first identifier has already been added:
+        ('.' subroutineName)? '(' expressionList ')'
+        @param tree The ParseTree of the statement or term holding the call
+        """
+        if self.have('symbol', '.'):
+            tree.addChild(self.consume())
+            tree.addChild(self.mustBe('identifier'))
+        tree.addChild(self.mustBe('symbol', '('))
+        tree.addChild(self.compileExpressionList())
+        tree.addChild(self.mustBe('symbol', ')'))
+
+    def compileExpressionList(self):
+        """
+        Generates a parse tree for a list of expressions, which may be none:
+        (expression (',' expression)*)?
+        @return a ParseTree that represents the expression list
+        """
+        tree = ParseTree('expressionList')
+        if self.lookup(term_first) is not None:
+            tree.addChild(self.compileExpression())
+            while self.have('symbol', ','):
+                tree.addChild(self.consume())
+                tree.addChild(self.compileExpression())
+        return tree
 
     def next(self):
         """
         Advance to the next token
         """
-        if self.current_idx < len(self.tokens) - 1:
+        if self.current_idx < self.count:
             self.current_idx += 1
 
     def current(self):
         """
         Return the current token
-        @return the token
+        @return the token, or None once every token has been consumed
         """
-        if 0 <= self.current_idx < len(self.tokens):
-            return self.tokens[self.current_idx]
+        if 0 <= self.current_idx < self.count:
+            return self.tokenAt(self.current_idx)
         return None
 
-    def have(self, expectedType, expectedValue):
+    def tokenAt(self, index):
+        """
+        Return the token at a valid index: the caller's Token, or a TokenView when parsing a TokenStream
+        @return the token
+        """
+        if self.tokens is self.stream:
+            return TokenView(self.stream, index)
+        return self.tokens[index]
+
+    def consume(self):
+        """
+        Advance past the current token, which the caller has already checked
+        @return token that was current prior to advancing.
+        """
+        index = self.current_idx
+        self.current_idx = index + 1
+        return self.tokenAt(index)
+
+    def have(self, expectedType, expectedValue=None):
         """
         Check if the current token matches the expected type and value.
+        Compares the stream's type code and interned value directly, without building a token object.
+        @param expectedValue The value to match, or None to accept any value of the type
         @return True if a match, False otherwise
         """
-        curr = self.current()
-        return curr and curr.getType() == expectedType and curr.getValue() == expectedValue
+        index = self.current_idx
+        return (index < self.count and self.types[index] == self.type_codes.get(expectedType)
+                and (expectedValue is None or self.values[index] == expectedValue))
 
     def mustBe(self, expectedType, expectedValue=None):
         """
@@ -63,29 +433,164 @@ class CompilerParser:
         If so, advance to the next token, returning the current token, otherwise throw/raise a ParseException.
         @return token that was current prior to advancing.
         """
-        if self.have(expectedType, expectedValue):
-            current_token = self.current()
-            self.next()
-            return current_token
-        raise ParseException(f"Expected token of type {expectedType} and value {expectedValue} but got {self.current().getType()} with value {self.current().getValue()}.")
+        index = self.current_idx
+        if (index < self.count and self.types[index] == self.type_codes.get(expectedType)
+                and (expectedValue is None or self.values[index] == expectedValue)):
+            self.current_idx = index + 1
+            if self.tokens is self.stream:
+                return TokenView(self.stream, index)
+            return self.tokens[index]
+        raise ParseException(self.describeMismatch(expectedType, expectedValue))
 
-if __name__ == "__main__":
+    def startsWith(self, first):
+        """
+        Check if the current token is in a FIRST set.
+        @param first A set (or dict) of (type code, value) keys, where a value of None matches any value
+        @return True if the current token is in the set, False otherwise
+        """
+        index = self.current_idx
+        if index < self.count:
+            code = self.types[index]
+            return (code, self.values[index]) in first or (code, None) in first
+        return False
+
+    def lookup(self, table):
+        """
+        Look the current token up in a FIRST-set table.
+        @param table A dict of (type code, value) keys, where a value of None matches any value
+        @return the entry for the current token, or None if it is not in the table
+        """
+        index = self.current_idx
+        if index < self.count:
+            code = self.types[index]
+            entry = table.get((code, self.values[index]))
+            if entry is None:
+                entry = table.get((code, None))
+            return entry
+        return None
+
+    def mustBeIn(self, first, description):
+        """
+        Check if the current token is in a FIRST set.
+        If so, advance to the next token, returning the current token, otherwise throw/raise a ParseException.
+        @param description What the set stands for, used in the error message
+        @return token that was current prior to advancing.
+        """
+        if self.startsWith(first):
+            return self.consume()
+        raise ParseException(self.describeUnexpected(description))
+
+    def describeMismatch(self, expectedType, expectedValue):
+        """
+        @return The error message for a token that is not the one expected.
+        """
+        return self.describeUnexpected(
+            f"token of type {expectedType}" + ("" if expectedValue is None else f" and value {expectedValue}"))
+
+    def describeUnexpected(self, expected):
+        """
+        @param expected What the grammar allows at the current token
+        @return The error message for a current token that is not what was expected.
+        """
+        current = self.current()
+        if current is None:
+            return f"Expected {expected} but reached the end of the input."
+        position = ""
+        if current.getLine():
+            position = f"line {current.getLine()}, column {current.getColumn()}: "
+        return f"{position}Expected {expected} but got {current.getType()} with value {current.getValue()}."
+
+
+# resolve the dispatch tables' method names now that the class exists
+for table in (statement_first, term_first):
+    for key, name in table.items():
+        table[key] = getattr(CompilerParser, name)
+del table, key, name
 
-    """ 
-    Tokens for:
-        class MyClass {
-        
-        }
+
+def syntheticClass(subroutines):
+    """
+    Generates the source of a Jack class of any size, using every construct of the grammar.
+    @param subroutines The number of subroutines in the class
+    @return The Jack source code
     """
-    tokens = []
-    tokens.append(Token("keyword", "class"))
-    tokens.append(Token("identifier", "MyClass"))
-    tokens.append(Token("symbol", "{"))
-    tokens.append(Token("symbol", "}"))
-
-    parser = CompilerParser(tokens)
-    try:
-        result = parser.compileProgram()
-        print(result)
-    except ParseException:
-        print("Error Parsing!")
+    lines = ['class Synthetic {', '    static int count;', '    field Array data, other;', '']
+    for n in range(subroutines):
+        lines.extend([
+            '    method int step{}(int a, boolean b, Synthetic s) {{'.format(n),
+            '        var int i, j;',
+            '        var String name;',
+            '        let name = "step {}";'.format(n),
+            '        let i = 0;',
+            '        while (i < a) {',
+            '            let data[i] = (data[i] + (i * {})) / 2 - ~j;'.format(n % 100),
+            '            if ((i & 1) = 0) {',
+            '                do s.step{}(i, ~b, this);'.format(n),
+            '            } else {',
+            '                let j = -j | Math.max(i, count);',
+            '            }',
+            '            let i = i + 1;',
+            '        }',
+            '        do Output.printString(name);',
+            '        return i > j;',
+            '    }',
+            '',
+        ])
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    import time
+    arg_parser = argparse.ArgumentParser(description='Parse Jack source files.')
+    arg_parser.add_argument('files', nargs='*', metavar='file',
+                            help='a .jack file, or a directory of them (without files, parses a small example)')
+    arg_parser.add_argument('--xml', action='store_true', help='print the parse trees in the nand2tetris XML format')
+    arg_parser.add_argument('--benchmark', action='store_true',
+                            help='time the parser and the text output on synthetic classes of growing size')
+    arg_parser.add_argument('--size', type=int, default=500,
+                            help='the subroutines in the smallest synthetic class (default: 500)')
+    args = arg_parser.parse_args()
+
+    if args.benchmark:
+        import io
+        from JackTokenizer import JackTokenizer
+        # the time per token stays flat as the class doubles in size when parsing is linear
+        for scale in (1, 2, 4, 8):
+            stream = JackTokenizer(syntheticClass(args.size * scale)).stream()
+            start = time.perf_counter()
+            tree = CompilerParser(stream).compileProgram()
+            seconds = time.perf_counter() - start
+            tree.write(io.StringIO(), 'xml' if args.xml else 'text')
+            print_seconds = time.perf_counter() - start - seconds
+            print('{:>9} tokens in {:.3f}s: {:.2f} us/token, {:.0f} tokens/s; printed in {:.3f}s'.format(
+                len(stream), seconds, seconds * 1e6 / len(stream), len(stream) / seconds, print_seconds))
+    elif args.files:
+        from JackTokenizer import JackTokenizer, expandSources
+        for path in expandSources(args.files):
+            try:
+                tree = CompilerParser(JackTokenizer.fromFile(path).stream()).compileProgram()
+                tree.write(sys.stdout, 'xml' if args.xml else 'text')
+            except ParseException as e:
+                sys.exit('{}: {}'.format(path, e.message))
+    else:
+        """
+        Tokens for:
+            class MyClass {
+
+            }
+        """
+        tokens = []
+        tokens.append(Token("keyword", "class"))
+        tokens.append(Token("identifier", "MyClass"))
+        tokens.append(Token("symbol", "{"))
+        tokens.append(Token("symbol", "}"))
+
+        parser = CompilerParser(tokens)
+        try:
+            result = parser.compileProgram()
+            print(result)
+        except ParseException:
+            print("Error Parsing!")
@@ -0,0 +1,190 @@
+"""
+The `JackTokenizer` module turns Jack source code into the `Token` objects consumed by `CompilerParser`.
+
+The source is scanned in a single pass by one compiled master regular expression whose alternatives are the
+token classes, so each token costs one regex match rather than a character-by-character loop.
+
+Classes and Main Functionalities:
+1. `JackTokenizer`:
+    - `__init__(self, source)`: Takes the program text.
+    - `tokens(self)`: Tokenizes the whole source into a list of `Token`s.
+    - `iterTokens(self)`: Lazily generates the same `Token`s one at a time.
+    - `stream(self)`: Tokenizes the whole source into a compact `TokenStream`, without creating a `Token` per token.
+    - `fromFile(path)`: Creates a tokenizer for a .jack file.
+
+Tokens have the types used by the Jack grammar: keyword, symbol, integerConstant, stringConstant and identifier.
+String constants are stored without their quotes. Every token records the line and column it starts at.
+Comments (`//`, `/* */` and `/** */`) and whitespace are skipped; anything else, an unterminated string or comment,
+or an integer above 32767 raises a ParseException naming the line and column.
+
+Sample Usage:
+    tokens = JackTokenizer(source).tokens()
+    tree = CompilerParser(tokens).compileProgram()
+    tree = CompilerParser(JackTokenizer(source).stream()).compileProgram()   (less memory, faster parsing)
+
+To use the tokenizer as a standalone script, pass .jack files or directories (searched recursively):
+$ python JackTokenizer.py Main.jack            (prints one 'line:column type value' per token)
+$ python JackTokenizer.py --benchmark src/     (reports the throughput in MB/s)
+"""
+
+import os
+import re
+import sys
+import time
+
+from ParseTree import ParseException, Token, TokenStream
+
+
+# the reserved words of the Jack language
+keywords = frozenset([
+    'class', 'constructor', 'function', 'method', 'field', 'static', 'var', 'int', 'char', 'boolean', 'void',
+    'true', 'false', 'null', 'this', 'let', 'do', 'if', 'else', 'while', 'return',
+])
+
+# one alternative per token class; skip swallows any run of whitespace and comments at once, and error
+# catches what is left: a comment or string that never ends, or a character outside the language
+token_pattern = re.compile(r'''
+      (?P<skip>(?:\s+|//[^\n]*|/\*.*?\*/)+)
+    | (?P<identifier>[A-Za-z_][A-Za-z0-9_]*)
+    | (?P<symbol>[{}()\[\].,;+\-*&|<>=~]|/(?!\*))
+    | (?P<integerConstant>[0-9]+)
+    | "(?P<stringConstant>[^"\n]*)"
+    | (?P<error>/\*|"|.)
+''', re.DOTALL | re.VERBOSE)
+
+
+class JackTokenizer:
+
+    def __init__(self, source):
+        """
+        Constructor for the JackTokenizer
+        @param source: The Jack program text.
+        """
+        self.source = source
+
+    @classmethod
+    def fromFile(cls, path):
+        """
+        @param path: The .jack file to tokenize.
+        @return: A JackTokenizer for the file's text.
+        """
+        with open(path, "r") as jack_file:
+            return cls(jack_file.read())
+
+    def tokens(self):
+        """
+        Tokenize the whole source.
+        @return: A list of Tokens.
+        """
+        return list(self.iterTokens())
+
+    def iterTokens(self):
+        """
+        Lazily tokenize the source, one regex match per token.
+        @return: A generator of Tokens.
+        """
+        for token_type, value, line, column in self.scan():
+            yield Token(token_type, value, line, column)
+
+    def stream(self):
+        """
+        Tokenize the whole source into a TokenStream.
+        @return: A TokenStream.
+        """
+        stream = TokenStream()
+        append = stream.append
+        for token_type, value, line, column in self.scan():
+            append(token_type, value, line, column)
+        return stream
+
+    def scan(self):
+        """
+        Runs the master regex over the source.
+        @return: A generator of (type, value, line, column) for every token.
+        """
+        source = self.source
+        count = source.count
+        rfind = source.rfind
+        line = 1
+        line_start = 0
+        # the position the line count was last brought up to date at
+        counted = 0
+        for match in token_pattern.finditer(source):
+            kind = match.lastgroup
+            if kind == 'skip':
+                continue
+            start = match.start()
+            # newlines only need counting up to each token, not inside every skipped run
+            newlines = count('\n', counted, start)
+            if newlines:
+                line += newlines
+                line_start = rfind('\n', counted, start) + 1
+            counted = start
+            column = start - line_start + 1
+            if kind == 'identifier':
+                value = match.group(kind)
+                yield 'keyword' if value in keywords else 'identifier', value, line, column
+            elif kind == 'integerConstant':
+                value = match.group(kind)
+                if int(value) > 32767:
+                    raise ParseException('line {}, column {}: integer constant {} is out of range (0..32767)'.format(
+                        line, column, value))
+                yield kind, value, line, column
+            elif kind == 'error':
+                raise ParseException('line {}, column {}: {}'.format(line, column, self.describeError(match.group())))
+            else:
+                yield kind, match.group(kind), line, column
+
+    @staticmethod
+    def describeError(text):
+        # explains what the error alternative of the master regex matched
+        if text == '/*':
+            return 'unterminated comment'
+        if text == '"':
+            return 'unterminated string constant'
+        return "unexpected character '{}'".format(text)
+
+
+def expandSources(paths):
+    """
+    @param paths: .jack files and directories.
+    @return: The .jack files, with directories searched recursively in sorted order.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, subdirectories, names in sorted(os.walk(path)):
+                subdirectories.sort()
+                files.extend(os.path.join(directory, name) for name in sorted(names) if name.endswith('.jack'))
+        else:
+            files.append(path)
+    return files
+
+
+if __name__ == "__main__":
+    import argparse
+    arg_parser = argparse.ArgumentParser(description='Tokenize Jack source files.')
+    arg_parser.add_argument('files', nargs='+', metavar='file', help='a .jack file, or a directory of them')
+    arg_parser.add_argument('--benchmark', action='store_true',
+                            help='only count the tokens and report the throughput in MB/s')
+    args = arg_parser.parse_args()
+
+    paths = expandSources(args.files)
+    total_bytes = total_tokens = 0
+    start = time.perf_counter()
+    for path in paths:
+        tokenizer = JackTokenizer.fromFile(path)
+        try:
+            if args.benchmark:
+                total_tokens += len(tokenizer.stream())
+                total_bytes += len(tokenizer.source)
+            else:
+                for token in tokenizer.iterTokens():
+                    print('{}:{}:{} {} {}'.format(path, token.getLine(), token.getColumn(), token.getType(),
+                                                  token.getValue()))
+        except ParseException as e:
+            sys.exit('{}: {}'.format(path, e.message))
+    if args.benchmark:
+        seconds = time.perf_counter() - start
+        print('{} files, {} tokens, {:.2f} MB in {:.3f}s: {:.2f} MB/s'.format(
+            len(paths), total_tokens, total_bytes / 1e6, seconds, total_bytes / 1e6 / seconds if seconds else 0.0))
@@ -13,9 +13,24 @@ Classes and Main Functionalities:
     - `getType(self)`: Obtains the type of the current node which provides context on the kind of syntactical construct the node represents.
     - `getValue(self)`: Fetches the value of the node, typically used for terminal nodes.
     - `__str__(self, depth=0)`: Generates a visual, indented representation of the tree for debugging or display purposes.
+    - `write(self, stream, style)`: Writes the same text, or the nand2tetris XML format, straight to a file-like object.
 
 3. `Token` (which inherits from `ParseTree`):
     - Represents the smallest unit of syntactic meaning in the source code. It acts as the leaf nodes in the tree structure and typically contains actual lexemes from the source code.
+    - `getLine(self)`, `getColumn(self)`: Where the token starts in the source, when it came from the `JackTokenizer`.
+
+4. `TokenStream` and `TokenView`:
+    - A compact sequence of tokens for large programs: type codes, interned values, lines and columns are kept in
+      parallel arrays instead of one object per token. Indexing a `TokenStream` returns a `TokenView`, a two-slot
+      object with the same read-only API as `Token` (`getType`, `getValue`, `getLine`, ...).
+
+5. `TreeWriter`:
+    - Serializes a tree in the text or XML format, walking it with an explicit stack and writing in chunks, so the time
+      taken is linear in the output and trees of any depth can be printed.
+
+6. `TreeVisitor` and the `preorder()` / `postorder()` iterators of `ParseTree`:
+    - Walk a tree with an explicit stack, so the depth is only limited by memory. A visitor subclass defines
+      `enter<Type>` / `leave<Type>` methods per node type, which are looked up once per type and visitor class.
 
 Overall, this module forms the structural backbone for transforming a flat list of tokens (produced by a lexer, for instance) into a hierarchical tree that captures the nested nature of programming languages.
 
@@ -26,8 +41,15 @@ getChildren(): Returns the child nodes of the current ParseTree.
 getType(): Returns the type of the current ParseTree.
 getValue(): Returns the value of the current ParseTree.
 __str__(depth=0): Returns a string representation of the ParseTree.
+write(stream, style='text'): Writes the ParseTree to a file-like object as text or XML.
+preorder(), postorder(): Iterate over the nodes of the ParseTree, parents before or after their children.
 """
 
+import io
+import sys
+from array import array
+
+
 class ParseException(Exception):
     """
     Raised when tokens provided don't match the expected grammar
@@ -80,33 +102,418 @@ class ParseTree():
     def __str__(self, depth=0):
         """
         Generate a string from this ParseTree.
+        @param depth: The depth the tree is printed at, when it is part of a bigger tree.
         @return: A printable representation of this ParseTree with indentation.
-        """        
-        # Set indentation
-        indent = ""
-        for i in range(depth):
-            indent += "  \u2502 "
-        
-        # Generate output
-        output = ""
-        if self.children:
-            # Output if the node has children
-            output += indent + self.node_type + "\n"
-            for child in self.children:
-                output += indent + "  \u2514 " + child.__str__(depth+1)
+        """
+        output = io.StringIO()
+        TreeWriter(output).writeText(self, depth)
+        return output.getvalue()
+
+    def write(self, stream, style='text'):
+        """
+        Write this ParseTree to a file-like object, without building the whole text in memory.
+        @param stream: The text stream to write to.
+        @param style: 'text' for the indented format of str(), or 'xml' for the nand2tetris XML format.
+        """
+        writer = TreeWriter(stream)
+        if style == 'xml':
+            writer.writeXML(self)
         else:
-            # Output if the node is a leaf/terminal
-            output += indent + self.node_type
-            if self.value:
-                output += " " + str(self.value)
-            output += "\n"
-        
-        return output
+            writer.writeText(self)
+
+    def preorder(self):
+        """
+        Iterate over the nodes of this ParseTree, each before its children, without recursion.
+        @return: A generator of the nodes, starting with this one.
+        """
+        yield self
+        # one iterator per open node, so the depth is only limited by memory
+        stack = [iter(self.children)]
+        while stack:
+            for node in stack[-1]:
+                yield node
+                children = node.children
+                if children:
+                    stack.append(iter(children))
+                    break
+            else:
+                stack.pop()
+
+    def postorder(self):
+        """
+        Iterate over the nodes of this ParseTree, each after its children, without recursion.
+        @return: A generator of the nodes, ending with this one.
+        """
+        stack = [(self, iter(self.children))]
+        while stack:
+            parent, children = stack[-1]
+            for node in children:
+                if node.children:
+                    stack.append((node, iter(node.children)))
+                    break
+                yield node
+            else:
+                stack.pop()
+                yield parent
+
 
-    
 class Token(ParseTree):
     """
     Token for parsing. Can be used as a terminal node in a ParseTree.
     """
-    def __init__(self, token_type, token_value):
-        super().__init__(token_type, token_value)
\ No newline at end of file
+    def __init__(self, token_type, token_value, line=0, column=0):
+        """
+        @param token_type: keyword, symbol, integerConstant, stringConstant or identifier.
+        @param token_value: The lexeme; string constants without their quotes.
+        @param line: The 1-based source line the token starts on, or 0 if unknown.
+        @param column: The 1-based column the token starts at, or 0 if unknown.
+        """
+        # the ParseTree fields are set directly; tokenizers create these by the million
+        self.node_type = token_type
+        self.value = token_value
+        self.children = []
+        self.line = line
+        self.column = column
+
+    def getLine(self):
+        """
+        @return: The source line the token starts on, or 0 if unknown.
+        """
+        return self.line
+
+    def getColumn(self):
+        """
+        @return: The source column the token starts at, or 0 if unknown.
+        """
+        return self.column
+
+
+# the token types of the Jack grammar, in the order of their TokenStream codes
+token_types = ('keyword', 'symbol', 'integerConstant', 'stringConstant', 'identifier')
+
+
+class TokenStream:
+    """
+    A sequence of tokens stored as parallel arrays: a small int type code, an interned value string,
+    a line and a column per token. Indexing it returns a TokenView.
+    """
+    def __init__(self):
+        # the type names, indexed by code; other types than the Jack ones are added as they are seen
+        self.type_names = list(token_types)
+        self.type_codes = {name: code for code, name in enumerate(self.type_names)}
+        self.types = bytearray()
+        self.values = []
+        self.lines = array('i')
+        self.columns = array('i')
+
+    @classmethod
+    def fromTokens(cls, tokens):
+        """
+        @param tokens: An iterable of Tokens.
+        @return: A TokenStream holding the same tokens.
+        """
+        stream = cls()
+        for token in tokens:
+            stream.append(token.getType(), token.getValue(), getattr(token, 'line', 0), getattr(token, 'column', 0))
+        return stream
+
+    def typeCode(self, token_type):
+        """
+        @param token_type: A token type name.
+        @return: The code the type is stored as.
+        """
+        code = self.type_codes.get(token_type)
+        if code is None:
+            code = self.type_codes[token_type] = len(self.type_names)
+            self.type_names.append(token_type)
+        return code
+
+    def append(self, token_type, token_value, line=0, column=0):
+        """
+        Adds a token at the end of the stream.
+        @param token_type: The type name, or its code.
+        """
+        if not isinstance(token_type, int):
+            token_type = self.typeCode(token_type)
+        self.types.append(token_type)
+        # equal values share one string object, so the stream holds each identifier once
+        self.values.append(sys.intern(token_value) if type(token_value) is str else token_value)
+        self.lines.append(line)
+        self.columns.append(column)
+
+    def toTokens(self):
+        """
+        @return: The tokens as a list of Token objects.
+        """
+        names = self.type_names
+        return [Token(names[code], value, line, column)
+                for code, value, line, column in zip(self.types, self.values, self.lines, self.columns)]
+
+    def __len__(self):
+        return len(self.types)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.types)
+        if not 0 <= index < len(self.types):
+            raise IndexError('token index out of range')
+        return TokenView(self, index)
+
+    def __iter__(self):
+        for index in range(len(self.types)):
+            yield TokenView(self, index)
+
+
+class TokenView:
+    """
+    A token of a TokenStream. Has the read-only API of Token and can be used as a terminal node in a ParseTree.
+    """
+    __slots__ = ('stream', 'index')
+
+    def __init__(self, stream, index):
+        self.stream = stream
+        self.index = index
+
+    @property
+    def node_type(self):
+        return self.stream.type_names[self.stream.types[self.index]]
+
+    @property
+    def value(self):
+        return self.stream.values[self.index]
+
+    @property
+    def line(self):
+        return self.stream.lines[self.index]
+
+    @property
+    def column(self):
+        return self.stream.columns[self.index]
+
+    @property
+    def children(self):
+        # tokens are always leaves
+        return []
+
+    def getChildren(self):
+        return []
+
+    def getType(self):
+        return self.node_type
+
+    def getValue(self):
+        return self.value
+
+    def getLine(self):
+        return self.line
+
+    def getColumn(self):
+        return self.column
+
+    def __repr__(self):
+        return 'TokenView({}, {!r}, line={}, column={})'.format(self.node_type, self.value, self.line, self.column)
+
+    def __str__(self, depth=0):
+        """
+        @return: The same text as a Token leaf with this type and value.
+        """
+        output = "  \u2502 " * depth + self.node_type
+        if self.value:
+            output += " " + str(self.value)
+        return output + "\n"
+
+
+# the characters XML needs escaped in token values
+xml_escapes = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;'})
+
+# the XML element names of the nand2tetris format that differ from this parser's node types
+xml_names = {'subroutine': 'subroutineDec'}
+
+
+class TreeWriter:
+    """
+    Serializes ParseTrees to a file-like object. The tree is walked with an explicit stack of child iterators,
+    so the time taken is linear in the size of the output and deep trees do not hit the recursion limit;
+    lines are collected into chunks and written once a chunk is full.
+    """
+    def __init__(self, stream, chunk_lines=4096):
+        """
+        @param stream: The text stream to write to.
+        @param chunk_lines: The number of lines collected before each write to the stream.
+        """
+        self.stream = stream
+        self.chunk_lines = chunk_lines
+        # the text format's line prefix for each depth
+        self.prefixes = ['']
+
+    def prefix(self, depth):
+        """
+        @return: What a node's line starts with in the text format, at a depth below the root.
+        """
+        prefixes = self.prefixes
+        while len(prefixes) <= depth:
+            level = len(prefixes)
+            prefixes.append("  │ " * (level - 1) + "  └ " + "  │ " * level)
+        return prefixes[depth]
+
+    def writeText(self, tree, depth=0):
+        """
+        Writes the indented format of str(): a node per line, with a leaf's value after its type.
+        @param tree: The ParseTree to write.
+        @param depth: The depth the tree is printed at, when it is part of a bigger tree.
+        """
+        lines = []
+        write = self.stream.write
+        chunk_lines = self.chunk_lines
+        lines.append("  │ " * depth + self.textLabel(tree))
+        # one iterator per open node; the depth of its children is given by the height of the stack
+        stack = [iter(tree.children)]
+        while stack:
+            prefix = self.prefix(depth + len(stack))
+            for node in stack[-1]:
+                children = node.children
+                if children:
+                    lines.append(prefix + node.node_type + "\n")
+                    stack.append(iter(children))
+                    break
+                value = node.value
+                lines.append(prefix + node.node_type + (" " + str(value) + "\n" if value else "\n"))
+                if len(lines) >= chunk_lines:
+                    write("".join(lines))
+                    lines.clear()
+            else:
+                stack.pop()
+        write("".join(lines))
+
+    @staticmethod
+    def textLabel(node):
+        """
+        @return: A node's line in the text format, without the prefix.
+        """
+        if node.children or not node.value:
+            return node.node_type + "\n"
+        return node.node_type + " " + str(node.value) + "\n"
+
+    def writeXML(self, tree):
+        """
+        Writes the nand2tetris XML format: an element per node, indented by two spaces per level,
+        with tokens written as <type> value </type>.
+        @param tree: The ParseTree to write.
+        """
+        lines = []
+        write = self.stream.write
+        chunk_lines = self.chunk_lines
+        # the element of each distinct token, without its indent; most tokens repeat many times
+        elements = {}
+        if tree.node_type in token_types:
+            write(self.xmlToken(tree))
+            return
+        name = xml_names.get(tree.node_type, tree.node_type)
+        lines.append("<" + name + ">\n")
+        # one (children iterator, closing tag) pair per open element
+        stack = [(iter(tree.children), "</" + name + ">\n")]
+        while stack:
+            children, closing = stack[-1]
+            indent = "  " * len(stack)
+            for node in children:
+                node_type = node.node_type
+                if node_type in token_types:
+                    key = (node_type, node.value)
+                    element = elements.get(key)
+                    if element is None:
+                        element = elements[key] = self.xmlToken(node)
+                    lines.append(indent + element)
+                    if len(lines) >= chunk_lines:
+                        write("".join(lines))
+                        lines.clear()
+                    continue
+                name = xml_names.get(node_type, node_type)
+                lines.append(indent + "<" + name + ">\n")
+                stack.append((iter(node.children), indent + "</" + name + ">\n"))
+                break
+            else:
+                stack.pop()
+                lines.append(closing)
+        write("".join(lines))
+
+    @staticmethod
+    def xmlToken(token):
+        """
+        @return: The XML element of a token, on its own line.
+        """
+        return "<{0}> {1} </{0}>\n".format(token.node_type, str(token.value).translate(xml_escapes))
+
+
+class TreeVisitor:
+    """
+    Base class for walking ParseTrees by node type, without recursion.
+    Subclasses define enter<Type>(node) and leave<Type>(node) methods for the node types they handle,
+    e.g. enterLetStatement, leaveExpression or enterIdentifier, called before and after the node's children.
+    enterNode and leaveNode are called for node types without their own method.
+    An enter method returning False skips the node's children; its leave method is still called.
+    """
+    def enterNode(self, node):
+        """
+        Called before the children of a node whose type has no enter method.
+        @return: False to skip the node's children.
+        """
+
+    def leaveNode(self, node):
+        """
+        Called after the children of a node whose type has no leave method.
+        """
+
+    def visit(self, tree):
+        """
+        Walks a tree, calling the enter and leave methods of every node in document order.
+        @param tree: The ParseTree to walk.
+        """
+        cache = self.handlerCache()
+        handlers = self.handlers
+        # one (node, leave method, children iterator) per node whose children are being walked
+        stack = []
+        node = tree
+        while True:
+            enter, leave = cache.get(node.node_type) or handlers(node.node_type)
+            children = node.children
+            if (enter is None or enter(self, node) is not False) and children:
+                stack.append((node, leave, iter(children)))
+            elif leave is not None:
+                leave(self, node)
+            # move on to the next child of the innermost open node, leaving the nodes that have none left
+            while stack:
+                parent, parent_leave, siblings = stack[-1]
+                node = next(siblings, None)
+                if node is not None:
+                    break
+                stack.pop()
+                if parent_leave is not None:
+                    parent_leave(self, parent)
+            else:
+                return
+
+    def handlerCache(self):
+        """
+        @return: The dict of each node type's (enter, leave) functions, shared by every instance of the visitor class.
+        """
+        cls = type(self)
+        cache = cls.__dict__.get('handler_cache')
+        if cache is None:
+            cache = {}
+            setattr(cls, 'handler_cache', cache)
+        return cache
+
+    def handlers(self, node_type):
+        """
+        Looks up the methods for a node type, the first time it is seen by the visitor class.
+        @param node_type: The node type, e.g. letStatement.
+        @return: The (enter, leave) functions, with None for a default that does nothing.
+        """
+        cls = type(self)
+        name = node_type[:1].upper() + node_type[1:]
+        enter = getattr(cls, 'enter' + name, cls.enterNode)
+        leave = getattr(cls, 'leave' + name, cls.leaveNode)
+        # the base class defaults are skipped rather than called
+        entry = (None if enter is TreeVisitor.enterNode else enter, None if leave is TreeVisitor.leaveNode else leave)
+        self.handlerCache()[node_type] = entry
+        return entry
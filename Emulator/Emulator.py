@@ -0,0 +1,560 @@
+"""
+Emulator Module
+
+Description:
+This module runs Hack machine code, so that the output of the Assembler and the VMTranslator can be executed and the
+speed of the generated programs measured in CPU cycles (one cycle per instruction).
+
+The Emulator provides the following functionalities:
+1. Loading: ROM images as .hack text or packed 16-bit words (as written by Assembler.writeBinary), and for convenience
+   .asm files and .vm files/directories, which are assembled/translated in memory.
+2. Predecoding: straight-line runs of instructions ending at a jump are compiled once, on first execution, into a Python
+   function operating on the A/D registers and RAM, so each run costs one call instead of one dispatch per instruction.
+3. Running: programs run until they halt (an '@L' / '0;JMP' loop at L), run off the end of ROM, or exhaust a cycle
+   budget; the executed cycle count is exact in every case.
+4. Reporting: the cycle count, how the run ended, the registers, the stack (RAM[256..SP-1]) and any RAM range.
+5. Profiling: the Profiler attributes executed cycles and code size to VM commands, functions and source lines using
+   the source maps of the Assembler and VMTranslator, as a sorted table or as folded stacks for flame graphs.
+6. Checking: the final state and cycle count can be compared with expected values (--expect, --expect-cycles);
+   Fixtures.py does so for every .vm and .asm fixture of the repository.
+
+Usage:
+To run programs as a standalone script, pass any number of .hack, .bin, .asm or .vm files (or VM program directories):
+$ python Emulator.py ../Assembler/Assembler102.asm
+$ python Emulator.py --max-cycles 100000 ../VMTranslator/vm_*.vm ../Assembler/*.asm
+$ python Emulator.py --ram 0=256 --dump 256-270 program.hack
+$ python Emulator.py --ram 0=5 --expect 1=6 --expect-cycles 4 ../Assembler/Assembler101.asm   (exit status 1 on mismatch)
+$ python Emulator.py --benchmark ../VMTranslator/TranslatorTest00.vm
+$ python Emulator.py --profile command --profile line --flamegraph prog.folded path_to_vm_directory
+
+VM files that are not a whole program (no Sys.vm) start with the segment pointers set the way the nand2tetris test
+scripts set them: SP=256, LCL=300, ARG=400, THIS=3000, THAT=3010.
+
+From Python:
+    emulator = Emulator(words)
+    emulator.run(max_cycles=10 ** 6)
+    print(emulator.cycles, emulator.stack())
+"""
+
+import os
+import sys
+import time
+from array import array
+
+# the Assembler and VMTranslator are optional; they are only needed to load .asm and .vm files
+_root = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.append(os.path.join(_root, 'Assembler'))
+sys.path.append(os.path.join(_root, 'VMTranslator'))
+try:
+    from Assembler import Assembler, AssemblerError, SymbolTable
+except ImportError:
+    Assembler = None
+try:
+    from VMTranslator import SourceMap, VMTranslator, VMTranslatorError, expandSources
+except ImportError:
+    VMTranslator = None
+
+
+class EmulatorError(Exception):
+    """
+    Raised when a program cannot be loaded or run
+    """
+    def __init__(self, message="An error occurred while emulating."):
+        self.message = message
+        super().__init__(self.message)
+
+
+# Python expressions computing each ALU function, keyed by the c1..c6 bits; y is A or RAM[A]
+comp_expressions = {
+    0b101010: '0',
+    0b111111: '1',
+    0b111010: '65535',
+    0b001100: 'D',
+    0b110000: 'y',
+    0b001101: 'D ^ 65535',
+    0b110001: 'y ^ 65535',
+    0b001111: '-D & 65535',
+    0b110011: '-y & 65535',
+    0b011111: 'D + 1 & 65535',
+    0b110111: 'y + 1 & 65535',
+    0b001110: 'D - 1 & 65535',
+    0b110010: 'y - 1 & 65535',
+    0b000010: 'D + y & 65535',
+    0b010011: 'D - y & 65535',
+    0b000111: 'y - D & 65535',
+    0b000000: 'D & y',
+    0b010101: 'D | y',
+}
+
+# Python conditions for each jump field, on the unsigned 16-bit ALU output o; None jumps unconditionally
+jump_conditions = {
+    0b001: '0 < o < 32768',
+    0b010: 'o == 0',
+    0b011: 'o < 32768',
+    0b100: 'o >= 32768',
+    0b101: 'o != 0',
+    0b110: 'o == 0 or o >= 32768',
+    0b111: None,
+}
+
+# the segment pointers the nand2tetris VM test scripts start with
+vm_test_ram = {0: 256, 1: 300, 2: 400, 3: 3000, 4: 3010}
+
+
+def alu(code, x, y):
+    '''Compute the Hack ALU output for the c1..c6 bits, for the combinations without a mnemonic'''
+    if code & 0b100000:
+        x = 0
+    if code & 0b010000:
+        x ^= 0xFFFF
+    if code & 0b001000:
+        y = 0
+    if code & 0b000100:
+        y ^= 0xFFFF
+    out = (x + y) & 0xFFFF if code & 0b000010 else x & y
+    if code & 0b000001:
+        out ^= 0xFFFF
+    return out
+
+
+def signed16(value):
+    # reads an unsigned 16-bit word as two's complement
+    return value - 0x10000 if value & 0x8000 else value
+
+
+class Emulator:
+
+    # compiled-code marker for an '@L' / '0;JMP' loop at L, which is how Hack programs halt
+    HALT = 'halt'
+
+    def __init__(self, words=(), ram=None):
+        """
+        Emulator constructor
+        @param words: The ROM image, one 16-bit instruction per item.
+        @param ram: Initial RAM contents as a dict of address -> value.
+        """
+        self.rom = array('H', words)
+        # 64K words so that any value of A can be used as an address without masking
+        self.ram = [0] * 65536
+        for address, value in (ram or {}).items():
+            self.ram[address] = value & 0xFFFF
+        self.A = 0
+        self.D = 0
+        self.pc = 0
+        self.cycles = 0
+        # how the last run ended: 'halt', 'end of ROM' or 'budget'
+        self.status = None
+        self.seconds = 0.0
+        # entry address -> compiled block, and its length in instructions
+        self.blocks = [None] * len(self.rom)
+        self.lengths = [0] * len(self.rom)
+        # single-instruction blocks, used to spend the last few cycles of a budget exactly
+        self.steps = [None] * len(self.rom)
+        # with profiling on, how often each block and single step was entered
+        self.block_counts = None
+        self.step_counts = None
+        # per ROM address, the (file, line, function, command) it came from, when loaded from source
+        self.origins = None
+
+    @classmethod
+    def fromHack(cls, lines, ram=None):
+        """
+        @param lines: Lines of .hack text, one 16-character binary word per line.
+        @return: An Emulator with that ROM.
+        """
+        words = []
+        for line_number, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                words.append(int(line, 2))
+            except ValueError:
+                raise EmulatorError("line {}: '{}' is not a binary word".format(line_number, line)) from None
+        return cls(words, ram)
+
+    @classmethod
+    def fromBinary(cls, data, ram=None):
+        """
+        @param data: Packed big-endian 16-bit words, as written by Assembler.writeBinary.
+        @return: An Emulator with that ROM.
+        """
+        words = array('H')
+        words.frombytes(data)
+        if sys.byteorder == 'little':
+            words.byteswap()
+        return cls(words, ram)
+
+    @classmethod
+    def fromFile(cls, path, ram=None, translator=None):
+        """
+        Loads a program by file type: .hack, .bin (packed words), .asm, or a .vm file or directory.
+
+        @param path: The file to load.
+        @param ram: Initial RAM contents; .vm files that are not a whole program default to the test-script pointers.
+        @param translator: The VMTranslator to translate .vm files with, e.g. a StackCachingTranslator or one with
+                           an optimizer; a plain VMTranslator by default.
+        @return: An Emulator with that ROM.
+        """
+        extension = os.path.splitext(path)[1]
+        if extension == '.hack':
+            with open(path, "r") as a_file:
+                return cls.fromHack(a_file, ram)
+        if extension == '.bin':
+            with open(path, "rb") as a_file:
+                return cls.fromBinary(a_file.read(), ram)
+        if extension == '.asm':
+            if Assembler is None:
+                raise EmulatorError('loading .asm files needs Assembler.py')
+            assembler = Assembler()
+            symbolTable = SymbolTable()
+            with open(path, "r") as a_file:
+                lines = a_file.readlines()
+            try:
+                instructions = assembler.parseInstructions(lines)
+                assembler.buildSymbolTable(instructions, symbolTable)
+                emulator = cls(assembler.generateWords(instructions, symbolTable), ram)
+            except AssemblerError as e:
+                raise EmulatorError(e.message) from None
+            file_name = os.path.basename(path)
+            emulator.origins = [(file_name, line, None, lines[line - 1].split('//')[0].strip())
+                                for line in assembler.sourceMap(instructions)]
+            return emulator
+        if extension == '.vm' or os.path.isdir(path):
+            if VMTranslator is None:
+                raise EmulatorError('loading .vm files needs VMTranslator.py')
+            paths = expandSources(path)
+            bootstrap = any(os.path.basename(vm_path) == 'Sys.vm' for vm_path in paths)
+            if translator is None:
+                translator = VMTranslator()
+            source_map = translator.source_map = SourceMap()
+            try:
+                words = translator.assembleProgram(paths, bootstrap)
+            except VMTranslatorError as e:
+                raise EmulatorError(e.message) from None
+            emulator = cls(words, vm_test_ram if ram is None and not bootstrap else ram)
+            emulator.origins = [source_map.lookup(address)[1:] for address in range(len(source_map))]
+            return emulator
+        raise EmulatorError("Cannot load '{}': expected .hack, .bin, .asm or .vm".format(path))
+
+    def compileBlock(self, start, limit=None):
+        """
+        Compiles the instructions from start up to and including the next jump (or the end of ROM).
+
+        @param start: The ROM address to start at.
+        @param limit: The maximum number of instructions to include.
+        @return: (function(A, D, RAM) -> (next pc, A, D), number of instructions), or (HALT, 0).
+        """
+        rom = self.rom
+        end = len(rom) if limit is None else min(len(rom), start + limit)
+        if limit is None and start + 1 < end and rom[start] == start and rom[start + 1] & 0xE03F == 0xE007:
+            # @start, then an unconditional jump that writes nothing: the program has halted
+            return self.HALT, 0
+
+        lines = ['def block(A, D, R):']
+        pc = start
+        while pc < end:
+            word = rom[pc]
+            pc += 1
+            if word < 0x8000:
+                lines.append('    A = {}'.format(word))
+                continue
+            code = (word >> 6) & 0x3F
+            y = 'R[A]' if word & 0x1000 else 'A'
+            if code in comp_expressions:
+                expression = comp_expressions[code].replace('y', y)
+            else:
+                expression = 'alu({}, D, {})'.format(code, y)
+            dest = (word >> 3) & 7
+            jump = word & 7
+            if not dest and not jump:
+                # computes something and throws it away
+                continue
+            if jump:
+                # the jump target is A as it was before this instruction
+                lines.append('    t = A')
+            lines.append('    o = {}'.format(expression))
+            if dest & 1:
+                lines.append('    R[A] = o')
+            if dest & 4:
+                lines.append('    A = o')
+            if dest & 2:
+                lines.append('    D = o')
+            if jump:
+                condition = jump_conditions[jump]
+                if condition is None:
+                    lines.append('    return t, A, D')
+                    end = pc
+                    break
+                lines.append('    if {}:'.format(condition))
+                lines.append('        return t, A, D')
+                end = pc
+                break
+        lines.append('    return {}, A, D'.format(end))
+
+        namespace = {'alu': alu}
+        exec(compile('\n'.join(lines), '<rom {}-{}>'.format(start, end - 1), 'exec'), namespace)
+        return namespace['block'], end - start
+
+    def enableProfiling(self):
+        """
+        Counts how often every instruction is executed from now on; @see executionCounts.
+        """
+        if self.block_counts is None:
+            self.block_counts = [0] * len(self.rom)
+            self.step_counts = [0] * len(self.rom)
+
+    def executionCounts(self):
+        """
+        @return: A list holding the number of times the instruction at each ROM address was executed.
+        """
+        counts = [0] * len(self.rom)
+        if self.block_counts is None:
+            return counts
+        lengths = self.lengths
+        for start, entered in enumerate(self.block_counts):
+            if entered:
+                # blocks always run to their end, so every instruction in one runs as often as it is entered
+                for address in range(start, start + lengths[start]):
+                    counts[address] += entered
+        for address, entered in enumerate(self.step_counts):
+            counts[address] += entered
+        return counts
+
+    def run(self, max_cycles=None):
+        """
+        Runs the program from the current state until it halts, runs off the end of ROM or exhausts the budget.
+
+        @param max_cycles: The maximum number of instructions to execute in this call, or None for no limit.
+        @return: The number of instructions executed in this call.
+        """
+        rom_size = len(self.rom)
+        blocks = self.blocks
+        lengths = self.lengths
+        steps = self.steps
+        block_counts = self.block_counts
+        step_counts = self.step_counts
+        R = self.ram
+        A, D, pc = self.A, self.D, self.pc
+        cycles = self.cycles
+        limit = cycles + max_cycles if max_cycles is not None else float('inf')
+        self.status = 'budget'
+        start_time = time.perf_counter()
+
+        while pc < rom_size:
+            block = blocks[pc]
+            if block is None:
+                block, lengths[pc] = self.compileBlock(pc)
+                blocks[pc] = block
+            if block is self.HALT:
+                self.status = self.HALT
+                break
+            length = lengths[pc]
+            if cycles + length > limit:
+                # finish the budget one instruction at a time
+                if cycles >= limit:
+                    break
+                block = steps[pc]
+                if block is None:
+                    block = steps[pc] = self.compileBlock(pc, 1)[0]
+                length = 1
+                if step_counts is not None:
+                    step_counts[pc] += 1
+            elif block_counts is not None:
+                block_counts[pc] += 1
+            pc, A, D = block(A, D, R)
+            cycles += length
+        else:
+            self.status = 'end of ROM'
+
+        self.seconds += time.perf_counter() - start_time
+        executed = cycles - self.cycles
+        self.A, self.D, self.pc, self.cycles = A, D, pc, cycles
+        return executed
+
+    def stack(self, base=256):
+        """
+        @param base: The address of the bottom of the stack.
+        @return: The values on the VM stack, RAM[base..SP-1], as signed integers.
+        """
+        return [signed16(value) for value in self.ram[base:self.ram[0]]]
+
+    def dump(self, first, last):
+        """
+        @return: RAM[first..last] as signed integers.
+        """
+        return [signed16(value) for value in self.ram[first:last + 1]]
+
+    def mismatches(self, expected):
+        """
+        Compares the state after a run with what it should be.
+
+        @param expected: A dict with any of 'status' (how the run ended), 'cycles', 'stack' (the values on the VM
+                         stack, bottom first) and 'ram' (a dict of address: value); values are compared as signed.
+        @return: A list of messages, one per difference; empty if the state is as expected.
+        """
+        messages = []
+        if 'status' in expected and self.status != expected['status']:
+            messages.append('ended with {} instead of {}'.format(self.status, expected['status']))
+        if 'cycles' in expected and self.cycles != expected['cycles']:
+            messages.append('took {} cycles instead of {}'.format(self.cycles, expected['cycles']))
+        if 'stack' in expected and self.stack() != list(expected['stack']):
+            messages.append('stack is {} instead of {}'.format(self.stack(), list(expected['stack'])))
+        for address, value in sorted(expected.get('ram', {}).items()):
+            if signed16(self.ram[address]) != signed16(value & 0xFFFF):
+                messages.append('RAM[{}] is {} instead of {}'.format(address, signed16(self.ram[address]),
+                                                                    signed16(value & 0xFFFF)))
+        return messages
+
+    def stats(self):
+        """
+        @return: A one-line summary of the runs so far.
+        """
+        speed = self.cycles / self.seconds / 1e6 if self.seconds else 0.0
+        return '{} cycles ({}), {:.3f}s, {:.1f}M cycles/s'.format(self.cycles, self.status, self.seconds, speed)
+
+
+class Profiler:
+    """
+    Attributes the cycles executed by an Emulator, and the ROM words of the program, to where the code came from.
+
+    Code is grouped by VM command ('push', 'call', ...), by function, or by source line ('Main:12 push local 0').
+    For .asm programs the command is the instruction itself; without a source (.hack, .bin) each ROM address
+    stands for itself.
+    """
+    GROUPS = ('command', 'function', 'line')
+
+    def __init__(self, emulator):
+        """
+        @param emulator: An Emulator that ran with profiling enabled.
+        """
+        self.counts = emulator.executionCounts()
+        self.total = sum(self.counts)
+        self.origins = emulator.origins
+        if self.origins is None:
+            self.origins = [(None, address, None, 'ROM[{}]'.format(address)) for address in range(len(self.counts))]
+
+    def key(self, origin, group):
+        # the name of the group an origin belongs to
+        file_name, line_number, function_name, command = origin
+        if group == 'command':
+            return command if command.startswith('<') else command.split()[0]
+        if group == 'function':
+            return function_name or '-'
+        return '{}:{} {}'.format(file_name or '-', line_number, command)
+
+    def totals(self, group):
+        """
+        @param group: One of GROUPS.
+        @return: A dict of group name -> [cycles, ROM words].
+        """
+        totals = {}
+        for address, origin in enumerate(self.origins):
+            entry = totals.setdefault(self.key(origin, group), [0, 0])
+            entry[0] += self.counts[address]
+            entry[1] += 1
+        return totals
+
+    def table(self, group='command', top=20):
+        """
+        @param group: One of GROUPS.
+        @param top: The number of rows to show.
+        @return: The hottest groups as a text table, sorted by cycles.
+        """
+        rows = sorted(self.totals(group).items(), key=lambda item: (-item[1][0], -item[1][1], item[0]))
+        lines = ['{:>12} {:>7} {:>7}  {}'.format('cycles', '%', 'words', group)]
+        for name, (cycles, words) in rows[:top]:
+            share = 100.0 * cycles / self.total if self.total else 0.0
+            lines.append('{:>12} {:>6.2f}% {:>7}  {}'.format(cycles, share, words, name))
+        if len(rows) > top:
+            lines.append('{:>12} {:>7} {:>7}  ({} more)'.format('', '', '', len(rows) - top))
+        return '\n'.join(lines)
+
+    def folded(self, prefix=None):
+        """
+        Generates the profile in the folded-stacks format read by flamegraph.pl and speedscope:
+        one 'frame;frame;frame cycles' line per source line, with frames program;function;line.
+
+        @param prefix: An outermost frame, such as the program name.
+        @return: The folded stacks as text.
+        """
+        stacks = {}
+        for address, origin in enumerate(self.origins):
+            if self.counts[address]:
+                frames = [self.key(origin, 'function'), self.key(origin, 'line')]
+                if prefix is not None:
+                    frames.insert(0, prefix)
+                # ';' separates frames, so it may not appear inside one
+                stack = ';'.join(frame.replace(';', ',') for frame in frames)
+                stacks[stack] = stacks.get(stack, 0) + self.counts[address]
+        return ''.join('{} {}\n'.format(stack, cycles) for stack, cycles in stacks.items())
+
+
+# A quick-and-dirty parser when run as a standalone script.
+if __name__ == "__main__":
+    import argparse
+    arg_parser = argparse.ArgumentParser(description='Run Hack programs and report their cycle counts and final state.')
+    arg_parser.add_argument('files', nargs='+', metavar='file',
+                            help='a .hack, .bin, .asm or .vm file, or a directory of .vm files')
+    arg_parser.add_argument('--max-cycles', type=int, default=10 ** 7,
+                            help='stop each program after this many instructions (default: 10000000)')
+    arg_parser.add_argument('--ram', action='append', default=[], metavar='ADDRESS=VALUE',
+                            help='set a RAM word before running (may be repeated)')
+    arg_parser.add_argument('--dump', action='append', default=[], metavar='FIRST-LAST',
+                            help='print a RAM range after running (may be repeated)')
+    arg_parser.add_argument('--expect', action='append', default=[], metavar='ADDRESS=VALUE',
+                            help='check a RAM word after running, exiting with status 1 if it differs (may be repeated)')
+    arg_parser.add_argument('--expect-cycles', type=int, metavar='N',
+                            help='check that each program ran for exactly N cycles, exiting with status 1 if not')
+    arg_parser.add_argument('--benchmark', action='store_true', help='print the emulation speed')
+    arg_parser.add_argument('--profile', action='append', default=[], choices=Profiler.GROUPS,
+                            help='print the hottest VM commands, functions or source lines (may be repeated)')
+    arg_parser.add_argument('--top', type=int, default=20, help='with --profile, the number of rows to print')
+    arg_parser.add_argument('--flamegraph', metavar='FILE',
+                            help='write the profile of every program to FILE as folded stacks for flamegraph.pl')
+    args = arg_parser.parse_args()
+    profiling = args.profile or args.flamegraph
+    flamegraph = open(args.flamegraph, "w") if args.flamegraph else None
+
+    try:
+        ram = dict(tuple(int(part) for part in setting.split('=')) for setting in args.ram) or None
+        dumps = [tuple(int(part) for part in setting.split('-')) for setting in args.dump]
+        expected = {'ram': dict(tuple(int(part) for part in setting.split('=')) for setting in args.expect)}
+    except ValueError:
+        arg_parser.error('--ram and --expect expect ADDRESS=VALUE and --dump FIRST-LAST')
+    if args.expect_cycles is not None:
+        expected['cycles'] = args.expect_cycles
+
+    failures = 0
+    for path in args.files:
+        try:
+            emulator = Emulator.fromFile(path, ram)
+        except (EmulatorError, OSError) as e:
+            print('{}: {}'.format(path, getattr(e, 'message', None) or e), file=sys.stderr)
+            failures += 1
+            continue
+        if profiling:
+            emulator.enableProfiling()
+        emulator.run(args.max_cycles)
+        stack = emulator.stack()
+        if len(stack) > 16:
+            # a runaway program can leave thousands of values; the top of the stack is what matters
+            stack = '[... {} more, {}]'.format(len(stack) - 16, str(stack[-16:])[1:-1])
+        print('{}: {} cycles ({}), SP={}, stack={}'.format(
+            path, emulator.cycles, emulator.status, emulator.ram[0], stack))
+        for first, last in dumps:
+            print('  RAM[{}..{}] = {}'.format(first, last, emulator.dump(first, last)))
+        for message in emulator.mismatches(expected):
+            print('  FAILED: ' + message)
+            failures += 1
+        if args.benchmark:
+            print('  ' + emulator.stats())
+        if profiling:
+            profiler = Profiler(emulator)
+            for group in args.profile:
+                print(profiler.table(group, args.top))
+            if flamegraph:
+                flamegraph.write(profiler.folded(path))
+    if flamegraph:
+        flamegraph.close()
+    sys.exit(1 if failures else 0)
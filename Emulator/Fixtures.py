@@ -0,0 +1,193 @@
+"""
+Fixtures Module
+
+Description:
+This module turns the repository's VM and assembly fixtures (VMTranslator/vm_*Test*.vm, VMTranslator/TranslatorTest00.vm
+and Assembler/Assembler*.asm) into executable tests. Each fixture is run in the Emulator with the RAM inputs listed in the
+fixtures table, and its final state - how the run ended, the VM stack, RAM words and the cycle count - is checked
+against the values the table expects, which were worked out by hand from the VM and Hack semantics.
+
+VM fixtures are run through every code generator of the VMTranslator ('plain', 'optimized', 'shared' and 'cache-tos'),
+which must all leave the same state. Cycle counts are those of the plain generator unless given per mode. Programs that
+never end are run for a fixed budget and only checked in the modes listed for them.
+
+Usage:
+$ python Fixtures.py               (runs every fixture, printing the failures; exit status 1 if any)
+$ python Fixtures.py -v            (also lists the runs that passed)
+$ python Fixtures.py --mode plain  (only runs the VM fixtures through the given code generators)
+"""
+
+import os
+import sys
+
+from Emulator import Emulator, EmulatorError, VMTranslator, vm_test_ram
+
+try:
+    from VMTranslator import StackCachingTranslator, VMOptimizer
+except ImportError:
+    StackCachingTranslator = None
+
+
+# the directory the fixture paths are relative to
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+# instructions each run may execute; enough for every fixture that ends
+budget = 10000
+
+END = 'end of ROM'
+HALT = Emulator.HALT
+BUDGET = 'budget'
+
+# fixture -> its runs. Each run sets the RAM words in 'given' (on top of the test-script pointers for .vm files) and
+# expects 'status', 'stack', 'ram' and 'cycles' (a count for the plain generator, or a dict of counts by mode);
+# 'modes' limits a run to some of the VM code generators.
+fixtures = {
+    'VMTranslator/TranslatorTest00.vm': [{'status': END, 'stack': [], 'ram': {16: 3}, 'cycles': 24}],
+    'VMTranslator/vm_addTest01.vm': [{'status': END, 'stack': [12], 'cycles': 19}],
+    'VMTranslator/vm_addTest02.vm': [{'status': END, 'stack': [12], 'cycles': 19}],
+    'VMTranslator/vm_addTest03.vm': [{'status': END, 'stack': [150], 'cycles': 19}],
+    'VMTranslator/vm_addTest04.vm': [{'status': END, 'stack': [-30], 'cycles': 19}],
+    'VMTranslator/vm_addTest05.vm': [{'status': END, 'stack': [15], 'cycles': 19}],
+    # x+0 is removed by the optimizer, even where there is no push for x to fold with
+    'VMTranslator/vm_addTest06.vm': [{'given': {255: 41}, 'status': END, 'ram': {0: 256, 255: 41},
+                                      'cycles': {'plain': 12, 'optimized': 0}}],
+    'VMTranslator/vm_addTest07.vm': [{'given': {300: 41}, 'status': END, 'stack': [41],
+                                      'cycles': {'plain': 23, 'optimized': 11}}],
+    'VMTranslator/vm_andTest01.vm': [{'status': END, 'stack': [1], 'cycles': 19}],
+    'VMTranslator/vm_andTest02.vm': [{'status': END, 'stack': [0], 'cycles': 19}],
+    'VMTranslator/vm_andTest03.vm': [{'status': END, 'stack': [0], 'cycles': 19}],
+    # MyFunction is never defined, so the call jumps to whatever its symbol resolves to; only the arguments
+    # pushed before it are certain
+    'VMTranslator/vm_callTest01.vm': [{'status': BUDGET, 'ram': {256: 5, 257: 10, 258: 15}, 'modes': ['plain']}],
+    'VMTranslator/vm_gotoTest01.vm': [{'status': BUDGET, 'ram': {256: 5, 257: 5}}],
+    # the first goto END jumps back onto itself: the emulator recognises the halt loop before running anything
+    'VMTranslator/vm_gotoTest02.vm': [{'status': HALT, 'stack': [], 'cycles': 0}],
+    'VMTranslator/vm_ifTest01.vm': [{'status': END, 'stack': [], 'cycles': 12}],
+    'VMTranslator/vm_ifTest02.vm': [{'status': END, 'stack': [1], 'cycles': 19}],
+    'VMTranslator/vm_labelTest01.vm': [{'status': HALT, 'stack': [], 'cycles': 0}],
+    'VMTranslator/vm_labelTest02.vm': [{'status': BUDGET, 'ram': {256: 5, 257: 5}}],
+    'VMTranslator/vm_negTest01.vm': [{'status': END, 'stack': [-8], 'cycles': 10}],
+    'VMTranslator/vm_negTest02.vm': [{'status': END, 'stack': [15], 'cycles': 10}],
+    'VMTranslator/vm_negTest03.vm': [{'status': END, 'stack': [0], 'cycles': 10}],
+    'VMTranslator/vm_notTest01.vm': [{'status': END, 'stack': [-1], 'cycles': 10}],
+    'VMTranslator/vm_notTest02.vm': [{'status': END, 'stack': [-2], 'cycles': 10}],
+    'VMTranslator/vm_notTest03.vm': [{'status': END, 'stack': [-101], 'cycles': 10}],
+    # the stack starts empty, so these pop the words below RAM[256]
+    'VMTranslator/vm_popTest01.vm': [{'given': {255: 11, 254: 22}, 'status': END,
+                                      'ram': {0: 254, 300: 11, 401: 22}, 'cycles': 24}],
+    'VMTranslator/vm_popTest02.vm': [{'given': {255: 11, 254: 22}, 'status': END,
+                                      'ram': {0: 254, 3010: 11, 3001: 22}, 'cycles': 24}],
+    'VMTranslator/vm_popTest03.vm': [{'status': END, 'stack': [10], 'ram': {5: 20}, 'cycles': 19}],
+    'VMTranslator/vm_popTest04.vm': [{'status': END, 'stack': [5, 15], 'ram': {5: 25}, 'cycles': 26}],
+    'VMTranslator/vm_popTest05.vm': [{'status': END, 'stack': [], 'ram': {5: 1}, 'cycles': 12}],
+    'VMTranslator/vm_pushTest01.vm': [{'given': {301: 33}, 'status': END, 'stack': [7, 33], 'cycles': 18}],
+    'VMTranslator/vm_pushTest02.vm': [{'given': {402: 44}, 'status': END, 'stack': [5, 44], 'cycles': 18}],
+    # the file's only static is the first variable the assembler allocates
+    'VMTranslator/vm_pushTest03.vm': [{'given': {16: 9}, 'status': END, 'stack': [9], 'cycles': 7}],
+    'VMTranslator/vm_pushTest04.vm': [{'status': END, 'stack': [100], 'cycles': 7}],
+    'VMTranslator/vm_pushTest05.vm': [{'status': END, 'stack': [30], 'cycles': 7}],
+    'VMTranslator/vm_pushTest06.vm': [{'status': END, 'stack': [0], 'cycles': 7}],
+    'VMTranslator/vm_subTest01.vm': [{'status': END, 'stack': [5], 'cycles': 19}],
+    'VMTranslator/vm_subTest02.vm': [{'status': END, 'stack': [-13], 'cycles': 19}],
+
+    # MD=-M negates RAM[0] until it is no longer positive, then halts at @4 / 0;JMP
+    'Assembler/Assembler100.asm': [{'given': {0: 7}, 'status': HALT, 'ram': {0: -7}, 'cycles': 4},
+                                   {'given': {0: -3}, 'status': HALT, 'ram': {0: -3}, 'cycles': 8}],
+    'Assembler/Assembler101.asm': [{'given': {0: 5}, 'status': END, 'ram': {1: 6}, 'cycles': 4}],
+    'Assembler/Assembler102.asm': [{'given': {0: 9, 1: 4}, 'status': END, 'ram': {2: 1}, 'cycles': 8},
+                                   {'given': {0: 4, 1: 9, 2: 7}, 'status': END, 'ram': {2: 0}, 'cycles': 10}],
+    'Assembler/Assembler103.asm': [{'given': {0: 12, 1: 10}, 'status': END, 'ram': {3: 8}, 'cycles': 6}],
+    'Assembler/Assembler104.asm': [{'given': {0: 3, 1: 10}, 'status': END, 'ram': {4: -7}, 'cycles': 6}],
+    'Assembler/Assembler105.asm': [{'given': {0: 5}, 'status': END, 'ram': {5: -6}, 'cycles': 5}],
+    'Assembler/Assembler106.asm': [{'given': {0: 42, 1: 42}, 'status': END, 'ram': {6: 1}, 'cycles': 8},
+                                   {'given': {0: 1, 1: 2, 6: 7}, 'status': END, 'ram': {6: 0}, 'cycles': 10}],
+    'Assembler/Assembler107.asm': [{'given': {0: 12, 1: 10}, 'status': END, 'ram': {7: 14}, 'cycles': 6}],
+    'Assembler/Assembler200.asm': [{'given': {0: -3}, 'status': HALT, 'ram': {0: -3}, 'cycles': 8}],
+    # the loop compares the counter with RAM[10] (not the constant 10) and stops once it reaches it:
+    # sum (RAM[16]) = 1 + ... + 9, counter (RAM[17]) = 10, in 4 + 8 * 12 + 10 instructions
+    'Assembler/Assembler201.asm': [{'given': {10: 10}, 'status': HALT, 'ram': {16: 45, 17: 10}, 'cycles': 110}],
+    # x, temp and y are the variables RAM[16..18]
+    'Assembler/Assembler202.asm': [{'status': END, 'ram': {16: 5, 17: 8, 18: 12}, 'cycles': 18}],
+    # fact (RAM[16]) is masked with the address of counter, and the loop tests RAM[0], so one pass is made
+    'Assembler/Assembler203.asm': [{'status': HALT, 'ram': {16: 1, 17: 4}, 'cycles': 18}],
+    'Assembler/Assembler204.asm': [{'given': {0: 7}, 'status': END, 'ram': {0: 7}, 'cycles': 4}],
+}
+
+
+def translators():
+    """
+    @return: A dict of VM code generator name -> a function creating a fresh translator of that kind.
+    """
+    return {
+        'plain': lambda: VMTranslator(),
+        'optimized': lambda: VMTranslator(optimizer=VMOptimizer()),
+        'shared': lambda: VMTranslator(shared_routines=True),
+        'cache-tos': lambda: StackCachingTranslator(),
+    }
+
+
+def runFixture(path, run, mode=None):
+    """
+    Runs a fixture once and checks the result.
+
+    @param path: The fixture, relative to the repository root.
+    @param run: One of its runs from the fixtures table.
+    @param mode: The VM code generator to translate a .vm fixture with.
+    @return: A list of messages, one per difference from the expected state; empty if the run passed.
+    """
+    vm = path.endswith('.vm')
+    ram = dict(vm_test_ram) if vm else {}
+    ram.update(run.get('given', {}))
+    expected = {key: run[key] for key in ('status', 'stack', 'ram') if key in run}
+    cycles = run.get('cycles')
+    if isinstance(cycles, dict):
+        if mode in cycles:
+            expected['cycles'] = cycles[mode]
+    elif cycles is not None and mode in (None, 'plain'):
+        expected['cycles'] = cycles
+    try:
+        emulator = Emulator.fromFile(os.path.join(root, path), ram, translators()[mode]() if vm else None)
+    except (EmulatorError, OSError) as e:
+        return [getattr(e, 'message', None) or str(e)]
+    emulator.run(budget)
+    return emulator.mismatches(expected)
+
+
+def runFixtures(modes=None, verbose=False):
+    """
+    Runs every fixture of the table, printing the runs that failed.
+
+    @param modes: The VM code generators to use, by default all of them.
+    @param verbose: Also print the runs that passed.
+    @return: The number of failed runs.
+    """
+    modes = modes or list(translators())
+    failures = runs = 0
+    for path, path_runs in fixtures.items():
+        for number, run in enumerate(path_runs, 1):
+            for mode in (modes if path.endswith('.vm') else [None]):
+                if mode is not None and mode not in run.get('modes', modes):
+                    continue
+                messages = runFixture(path, run, mode)
+                runs += 1
+                name = '{} #{}{}'.format(path, number, ' ({})'.format(mode) if mode else '')
+                if messages:
+                    failures += 1
+                    print('{}: FAILED: {}'.format(name, '; '.join(messages)))
+                elif verbose:
+                    print('{}: ok'.format(name))
+    print('{} runs, {} failed'.format(runs, failures))
+    return failures
+
+
+# A quick-and-dirty parser when run as a standalone script.
+if __name__ == "__main__":
+    import argparse
+    arg_parser = argparse.ArgumentParser(description='Run the repository fixtures in the Emulator and check them.')
+    arg_parser.add_argument('-v', '--verbose', action='store_true', help='also list the runs that passed')
+    arg_parser.add_argument('--mode', action='append', choices=['plain', 'optimized', 'shared', 'cache-tos'],
+                            help='translate the VM fixtures with this code generator (may be repeated; default: all)')
+    args = arg_parser.parse_args()
+    if VMTranslator is None:
+        sys.exit('the fixtures need Assembler.py and VMTranslator.py')
+    sys.exit(1 if runFixtures(args.mode, args.verbose) else 0)
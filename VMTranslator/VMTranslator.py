@@ -6,29 +6,446 @@ This module translates VM commands into Hack assembly code. The VM language is a
 serves as an intermediate representation between high-level object-based language and the Hack machine language.
 
 The VMTranslator provides the following functionalities:
-1. Arithmetic and logical operations: Performs basic arithmetic (add, sub) and logical operations (neg, eq, gt, lt, or).
+1. Arithmetic and logical operations: Performs basic arithmetic (add, sub) and logical operations (neg, eq, gt, lt, and, or, not).
 2. Memory access commands: Manipulate the stack and the memory segments, including push and pop operations across different segments like constant, local, argument, this, that, pointer, temp, and static.
 3. Program control commands: Generates code for functions, call, and return commands, allowing for the program's flow to change as per function calls and returns.
 4. Branching commands: Generates assembly code to support VM branching commands like label, goto, and if-goto.
 
 In addition to the class, standalone functions provide additional functionality for certain VM commands. If executed as
-a standalone script, it reads VM commands from a file and writes the corresponding Hack assembly code to the standard
-output.
+a standalone script, it reads VM commands from a file (or every .vm file in a directory) and writes the corresponding
+Hack assembly code to the standard output.
+
+Static variables are named File.N after the .vm file they belong to. A directory is translated as one program: every
+file is translated in parallel in a pool of worker processes and the outputs are concatenated in file name order,
+preceded by the bootstrap code (SP=256, call Sys.init) when the directory contains Sys.vm.
 
 Usage:
 To use the VMTranslator as a standalone script, run it with the path to the VM file as an argument:
 $ python VMTranslator.py path_to_vm_file.vm
+$ python VMTranslator.py --shared --stats path_to_vm_file.vm   (smaller ROM: shared eq/gt/lt/call/return)
+$ python VMTranslator.py -O --disable fuse_push_pop path_to_vm_file.vm   (VM-level optimizer)
+$ python VMTranslator.py --cache-tos path_to_vm_file.vm   (keep the top of stack in D)
+$ python VMTranslator.py --jobs 8 path_to_vm_directory   (whole program, files translated in parallel)
+$ python VMTranslator.py --incremental --stats path_to_vm_directory   (reuse unchanged files from DIR.vmcache)
+$ python VMTranslator.py --hack path_to_vm_directory   (machine code, without going through assembly text)
+$ python VMTranslator.py --source-map Prog.map path_to_vm_directory   (ROM address -> .asm line and VM command)
+$ cat Main.vm | python VMTranslator.py --name Main - | python ../Assembler/Assembler.py - > Main.hack   (pipeline)
+
+From Python, translate a whole program (a file, an iterable of lines or a string) in one call:
+    asm = translate(open('Prog.vm'))
+    VMTranslator().translate(lines, out_stream)
+    VMTranslator().translateProgram(['Main.vm', 'Sys.vm'], out_stream, jobs=4)
+    words = VMTranslator().assembleProgram(['Main.vm', 'Sys.vm'])   (needs Assembler.py next door)
 """
 
+import glob
+import hashlib
+import io
+import os
+import pickle
+import sys
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+# the Assembler is optional; it is only needed to translate straight to machine code
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'Assembler'))
+try:
+    from Assembler import Assembler, AssemblerError, SymbolTable
+except ImportError:
+    Assembler = None
+
+
+class VMTranslatorError(Exception):
+    """
+    Raised when a VM command cannot be translated
+    """
+    def __init__(self, message="An error occurred while translating."):
+        self.message = message
+        super().__init__(self.message)
+
+
 class VMTranslator:
 
+    def __init__(self, buffer_size=1 << 16, shared_routines=False, optimizer=None, source_map=None):
+        """
+        VMTranslator constructor
+        @param buffer_size: The number of characters of output buffered before each write.
+        @param shared_routines: Optimize for code size: eq/gt/lt/call/return jump into routines
+                                emitted once at the end of the program instead of being inlined.
+        @param optimizer: A VMOptimizer to run over each program's commands before code generation.
+        @param source_map: A SourceMap to record the VM command behind every line of generated code in.
+        """
+        self.buffer_size = buffer_size
+        self.optimizer = optimizer
+        self.source_map = source_map
+        self.shared_routines = shared_routines
+        self.commands = dict(commands, **shared_commands) if shared_routines else commands
+        # shared routines referenced so far, in first-use order
+        self.used_routines = {}
+        # ROM words saved by shared routines (call sites vs. inline code, minus the routines themselves)
+        self.words_saved = 0
+        # running counter making the labels emitted by eq/gt/lt and call unique
+        self.label_count = 0
+        # the function being translated, used to scope label/goto/if-goto
+        self.function_name = None
+        # the .vm file being translated (without extension); names its statics and prefixes its label ids
+        self.file_name = None
+        # generated snippet -> its parsed Instructions, for translating straight to machine code
+        self.parsed_code = {}
+        self.assembler = Assembler() if Assembler is not None else None
+
+    def translate(self, source, stream=None, file_name=None, finish=True):
+        """
+        Translates a whole VM program, or one file of it.
+
+        @param source: An open .vm file, an iterable of VM lines, or the program text as a single string.
+        @param stream: A text file-like object to write the assembly to; if omitted it is returned instead.
+        @param file_name: The name of the file being translated, e.g. 'Main'. Its statics become Main.N and
+                          its labels are made unique across files; without it statics are named static.N.
+        @param finish: Append the shared routines used; pass False when more files of the program follow.
+        @return: The Hack assembly code as a string, or None when a stream is given.
+        """
+        if isinstance(source, str):
+            source = source.splitlines()
+        result = None
+        if stream is None:
+            stream = result = io.StringIO()
+        if file_name is not None:
+            self.file_name = file_name
+            self.function_name = None
+
+        buffer = []
+        buffered = 0
+        buffer_size = self.buffer_size
+        for asm_code in self.iterCode(source):
+            buffer.append(asm_code)
+            buffered += len(asm_code)
+            if buffered >= buffer_size:
+                stream.write(''.join(buffer))
+                buffer.clear()
+                buffered = 0
+        if finish:
+            buffer.append(self.finishRoutines())
+        stream.write(''.join(buffer))
+
+        if result is not None:
+            return result.getvalue()
+        return None
+
+    def iterCode(self, source):
+        """
+        Translates a VM program command by command.
+
+        @param source: An iterable of VM lines.
+        @return: A generator of the assembly code of each command, followed by the end-of-file code.
+        """
+        commands = self.iterCommands(source)
+        if self.optimizer is not None:
+            commands = self.optimizer.optimize(list(commands))
+        source_map = self.source_map
+        for tokens, line_number in commands:
+            try:
+                asm_code = self.translateCommand(tokens)
+            except VMTranslatorError as e:
+                raise VMTranslatorError('line {}: {}'.format(line_number, e.message)) from None
+            if source_map is not None:
+                self.record(asm_code, line_number, ' '.join(tokens))
+            yield asm_code
+        asm_code = self.finishFile()
+        if asm_code and source_map is not None:
+            self.record(asm_code, 0, '<end of file>')
+        yield asm_code
+
+    def record(self, asm_code, line_number, command):
+        """
+        Adds generated code to the source map, if there is one.
+
+        @param asm_code: The assembly code, as output.
+        @param line_number: The line of the VM command in the current file, or 0 for generated code.
+        @param command: The VM command, or a description of the generated code.
+        """
+        if self.source_map is not None:
+            self.source_map.add(asm_code, (self.file_name, line_number, self.function_name, command))
+
+    def translateInstructions(self, source, file_name=None, finish=True):
+        """
+        Translates a VM program straight to parsed Hack instructions, without building the assembly text.
+
+        @param source: An open .vm file, an iterable of VM lines, or the program text as a single string.
+        @param file_name: The name of the file being translated. @see translate
+        @param finish: Append the shared routines used; pass False when more files of the program follow.
+        @return: A list of Assembler Instructions, ready for Assembler.buildSymbolTable/generateWords.
+        """
+        if isinstance(source, str):
+            source = source.splitlines()
+        if file_name is not None:
+            self.file_name = file_name
+            self.function_name = None
+        instructions = []
+        extend = instructions.extend
+        instructionsFor = self.instructionsFor
+        for asm_code in self.iterCode(source):
+            extend(instructionsFor(asm_code))
+        if finish:
+            extend(instructionsFor(self.finishRoutines()))
+        return instructions
+
+    def instructionsFor(self, asm_code):
+        """
+        Parses the code generated for one command into Instructions.
+
+        Most commands generate one of a small set of snippets (push local 2, add, ...), so each distinct
+        snippet is parsed once and its Instructions are shared by every occurrence. Snippets defining
+        labels are unique to one occurrence and are not kept.
+
+        @param asm_code: The assembly code of one command.
+        @return: A list of Instructions.
+        """
+        instructions = self.parsed_code.get(asm_code)
+        if instructions is None:
+            if Assembler is None:
+                raise VMTranslatorError('translating to machine code needs Assembler.py')
+            parseLine = self.assembler.parseLine
+            instructions = [parseLine(line) for line in asm_code.splitlines()]
+            if '(' not in asm_code:
+                self.parsed_code[asm_code] = instructions
+        return instructions
+
+    def assembleProgram(self, paths, bootstrap=None):
+        """
+        Translates a multi-file VM program straight to machine code.
+
+        The files are translated in-process, in the order of paths, into Instructions that are handed to
+        the Assembler without going through assembly text.
+
+        @param paths: The .vm files making up the program.
+        @param bootstrap: Emit SP=256 and a call to Sys.init first; by default only if one of the files is Sys.vm.
+        @return: An array('H') holding one 16-bit word per instruction.
+        """
+        if bootstrap is None:
+            bootstrap = any(os.path.basename(path) == 'Sys.vm' for path in paths)
+        instructions = self.instructionsFor(self.bootstrap()) if bootstrap else []
+        for path in paths:
+            file_name = os.path.splitext(os.path.basename(path))[0]
+            with open(path, "r") as a_file:
+                try:
+                    instructions += self.translateInstructions(a_file, file_name, finish=False)
+                except VMTranslatorError as e:
+                    raise VMTranslatorError('{}: {}'.format(path, e.message)) from None
+        instructions += self.instructionsFor(self.finishRoutines())
+
+        symbolTable = SymbolTable()
+        try:
+            self.assembler.buildSymbolTable(instructions, symbolTable)
+            return self.assembler.generateWords(instructions, symbolTable)
+        except AssemblerError as e:
+            # e.g. too many statics for the RAM reserved for variables
+            raise VMTranslatorError(e.message) from None
+
+    def translateProgram(self, paths, stream=None, jobs=None, bootstrap=None, cache=None):
+        """
+        Translates a multi-file VM program, such as the .vm files of a directory.
+
+        The files are translated independently, in a pool of worker processes when there is more than
+        one, and their code is concatenated in the order of paths; the output does not depend on the
+        number of workers. Shared routines used by any file are emitted once at the end.
+
+        @param paths: The .vm files making up the program.
+        @param stream: A text file-like object to write the assembly to; if omitted it is returned instead.
+        @param jobs: The number of worker processes (defaults to the CPU count; 1 translates in-process).
+        @param bootstrap: Emit SP=256 and a call to Sys.init first; by default only if one of the files is Sys.vm.
+        @param cache: A TranslationCache; only files missing from it are translated, and it is updated
+                      with them (the caller saves it).
+        @return: The Hack assembly code as a string, or None when a stream is given.
+        """
+        result = None
+        if stream is None:
+            stream = result = io.StringIO()
+        if bootstrap is None:
+            bootstrap = any(os.path.basename(path) == 'Sys.vm' for path in paths)
+        if bootstrap:
+            stream.write(self.bootstrap())
+
+        # each file gets its own optimizer with these settings; their statistics are merged into ours
+        enabled = self.optimizer.enabled if self.optimizer is not None else None
+        task = (type(self), self.shared_routines, enabled, self.source_map is not None)
+        results = {}
+        sources = dict.fromkeys(paths)
+        keys = {}
+        if cache is not None:
+            options = (type(self).__name__, self.shared_routines, enabled and tuple(sorted(enabled.items())),
+                       self.source_map is not None)
+            for path in paths:
+                # the text is read once here so the cached fragment always matches the key
+                with open(path, "rb") as a_file:
+                    source = a_file.read()
+                keys[path] = cache.key(source, os.path.splitext(os.path.basename(path))[0], options)
+                results[path] = cache.get(keys[path])
+                sources[path] = source.decode()
+        pending = [path for path in paths if results.get(path) is None]
+
+        if jobs is None:
+            jobs = os.cpu_count() or 1
+        if jobs > 1 and len(pending) > 1:
+            with ProcessPoolExecutor(min(jobs, len(pending))) as executor:
+                # start the largest files first so the slowest one is not left until the end
+                by_size = sorted(pending, key=lambda path: -os.path.getsize(path))
+                futures = {path: executor.submit(_translateFile, path, sources[path], *task) for path in by_size}
+                for path in pending:
+                    results[path] = futures[path].result()
+        else:
+            for path in pending:
+                results[path] = _translateFile(path, sources[path], *task)
+        if cache is not None:
+            for path in pending:
+                cache.put(keys[path], results[path])
+        results = [results[path] for path in paths]
+
+        for asm_code, used_routines, words_saved, file_optimizer, file_map in results:
+            stream.write(asm_code)
+            if file_map is not None:
+                self.source_map.extend(file_map)
+            for routine in used_routines:
+                self.used_routines.setdefault(routine, True)
+            self.words_saved += words_saved
+            if file_optimizer is not None:
+                self.optimizer.merge(file_optimizer)
+        stream.write(self.finishRoutines())
+
+        if result is not None:
+            return result.getvalue()
+        return None
+
+    def bootstrap(self):
+        """
+        Generates the bootstrap code: SP=256, then call Sys.init.
+        @return: The assembly code as a string.
+        """
+        asm_code = '@256\nD=A\n@SP\nM=D\n' + self.translateCommand(['call', 'Sys.init', '0'])
+        self.record(asm_code, 0, '<bootstrap>')
+        return asm_code
+
+    def iterCommands(self, source):
+        """
+        Splits VM source into commands, skipping comments and blank lines.
+
+        @param source: An iterable of VM lines.
+        @return: A generator of (tokens, line number) pairs.
+        """
+        for line_number, line in enumerate(source, 1):
+            # drop comments and surrounding whitespace
+            comment = line.find('//')
+            if comment != -1:
+                line = line[:comment]
+            tokens = line.split()
+            if tokens:
+                yield tokens, line_number
 
+    def translateCommand(self, tokens):
+        """
+        Generates the Hack assembly code for one VM command.
+
+        @param tokens: The command split into words, e.g. ['push', 'constant', '7'].
+        @return: The assembly code as a string.
+        """
+        command, handler, args = self.parseCommand(tokens)
+        return self.generateCommand(command, handler, args)
+
+    def parseCommand(self, tokens):
+        """
+        Validates a VM command and converts its arguments.
+
+        @param tokens: The command split into words.
+        @return: (command name, code generator, argument list) ready for generateCommand.
+        """
+        command = tokens[0].lower()
+        entry = self.commands.get(command)
+        if entry is None:
+            raise VMTranslatorError("Unknown command '{}'".format(command))
+        handler, arguments, unique = entry[:3]
+        if len(tokens) - 1 != len(arguments):
+            raise VMTranslatorError("'{}' takes {} argument(s), got {}".format(command, len(arguments), len(tokens) - 1))
+
+        args = []
+        for argument, token in zip(arguments, tokens[1:]):
+            if argument == 'int':
+                try:
+                    token = int(token)
+                except ValueError:
+                    raise VMTranslatorError("'{}' expects a number, got '{}'".format(command, token)) from None
+            elif argument == 'segment':
+                # segment names are case-insensitive like command names; labels and functions are not
+                token = token.lower()
+            elif argument == 'label' and self.function_name is not None:
+                # labels are scoped to the enclosing function
+                token = '{}${}'.format(self.function_name, token)
+            args.append(token)
+        for index, argument in enumerate(arguments[:-1]):
+            if argument == 'segment' and args[index] == 'static':
+                # statics are resolved to their File.N symbol here, so the code generators need no file name
+                args[index + 1] = '{}.{}'.format(self.file_name or 'static', args[index + 1])
+        if command == 'function':
+            self.function_name = args[0]
+        if unique:
+            # commands that emit their own labels need a fresh id each time
+            self.label_count += 1
+            if self.file_name is not None:
+                # ids restart in every file, so qualify them to keep merged files apart
+                args.append('{}.{}'.format(self.file_name, self.label_count))
+            else:
+                args.append(self.label_count)
+        return command, handler, args
+
+    def generateCommand(self, command, handler, args):
+        """
+        Generates the Hack assembly code for a parsed VM command.
+        @return: The assembly code as a string.
+        """
+        asm_code = handler(*args)
+        if self.shared_routines and command in shared_commands:
+            self.used_routines.setdefault(shared_commands[command][3], True)
+            self.words_saved += inline_words[command] - countWords(asm_code)
+        return asm_code
+
+    def finishFile(self):
+        """
+        Generates any code needed at the end of a file; subclasses holding state in registers flush it here.
+        @return: The assembly code, or ''.
+        """
+        return ''
+
+    def finishRoutines(self):
+        """
+        Generates the shared routines used since the last call, preceded by an end-of-program halt loop
+        so that execution can never fall through into them.
+        @return: The assembly code, or '' if no routine was used.
+        """
+        if not self.used_routines:
+            return ''
+        asm_code = '(VM_HALT)\n@VM_HALT\n0;JMP\n'
+        for routine in self.used_routines:
+            asm_code += shared_routines[routine]()
+        self.used_routines = {}
+        self.words_saved -= countWords(asm_code)
+        if self.source_map is not None:
+            # the routines belong to the whole program rather than to the last file translated
+            self.source_map.add(asm_code, (None, 0, None, '<shared routines>'))
+        return asm_code
+
+    def stats(self):
+        """
+        @return: A one-line summary of the ROM words saved by shared routines.
+        """
+        return 'Shared routines: {} ROM words saved'.format(self.words_saved)
+
+    @staticmethod
     def vm_push(segment, offset):
         '''Generate Hack Assembly code for a VM push operation'''
         if segment == 'constant':
             # if the segment constant load the constant value into D
             # then push the value in D register to the stack and increment the stack pointer
-            return '@{}\nD=A\n@SP\nA=M\nM=D\n@SP\nM=M+1\n'.format(offset)
+            return VMTranslator.vm_load('constant', offset) + '@SP\nA=M\nM=D\n@SP\nM=M+1\n'
         else:
             # if segment is either local, arg , this or that
             if segment in ['local', 'argument', 'this', 'that']:
@@ -52,12 +469,15 @@ class VMTranslator:
                 asm_code = '@{}\nD=M\n'.format(base_addr)
             elif segment == 'static':
                 # if the segment is static
-                asm_code = '@static.{}\nD=M\n'.format(offset)
+                asm_code = '@{}\nD=M\n'.format(VMTranslator.fixed_address(segment, offset))
+            else:
+                raise VMTranslatorError("Cannot push from segment '{}'".format(segment))
                 
             # common code for all segments to push D register to the stack and increment the stack pointer
             asm_code += '@SP\nA=M\nM=D\n@SP\nM=M+1\n'
             return asm_code 
 
+    @staticmethod
     def vm_pop(segment, offset):
         '''Generate Hack Assembly code for a VM pop operation'''
         if segment in ['local', 'argument', 'this', 'that']:
@@ -81,19 +501,24 @@ class VMTranslator:
             asm_code = '@SP\nAM=M-1\nD=M\n@{}\nM=D\n'.format(base_addr)
 
         elif segment == 'static':
-            # for static saeg, each variable is given a unique label prefixed with "static."
+            # for static saeg, each variable is given a unique label prefixed with the file name
             # pop top val from the stack into D, then store it in the unique static variable address
-            asm_code = '@SP\nAM=M-1\nD=M\n@static.{}\nM=D\n'.format(offset)
+            asm_code = '@SP\nAM=M-1\nD=M\n@{}\nM=D\n'.format(VMTranslator.fixed_address(segment, offset))
+
+        else:
+            raise VMTranslatorError("Cannot pop to segment '{}'".format(segment))
 
         # return the generated assembly code
         return asm_code
 
+    @staticmethod
     def vm_add():
         '''Generate Hack Assembly code for a VM add operation'''
         # decerement stack pointer & load topmost val from the stack into D
         # go to the next topmost value in the stack and add the value in D to it
         return '@SP\nAM=M-1\nD=M\nA=A-1\nM=D+M\n'
 
+    @staticmethod
     def vm_sub():
         '''Generate Hack Assembly code for a VM sub operation'''
 
@@ -103,117 +528,784 @@ class VMTranslator:
 
         return '@SP\nAM=M-1\nD=M\nA=A-1\nM=M-D\n'
 
+    @staticmethod
     def vm_neg():
         '''Generate Hack Assembly code for a VM neg operation'''
         # decerement stack pointer & load topmost val from the stack into D
 
         return '@SP\nA=M-1\nM=-M\n'
 
-    def vm_eq():
+    @staticmethod
+    def vm_eq(label_id=0):
         '''Generate Hack Assembly code for a VM eq operation'''
-        return ""
-    
-
-def vm_eq():
-    '''Generate Hack Assembly code for a VM eq operation'''
-    label1 = "EQ_TRUE_{}".format(id(vm_eq))
-    label2 = "EQ_END_{}".format(id(vm_eq))
-    return ('@SP\nAM=M-1\nD=M\nA=A-1\nD=M-D\n@{}\nD;JEQ\n'
-            '@SP\nA=M-1\nM=0\n@{}\n0;JMP\n'
-            '({})\n@SP\nA=M-1\nM=-1\n'
-            '({})\n').format(label1, label2, label1, label2)
-
-def vm_gt():
-    '''Generate Hack Assembly code for a VM gt operation'''
-    label1 = "GT_TRUE_{}".format(id(vm_gt))
-    label2 = "GT_END_{}".format(id(vm_gt))
-    return ('@SP\nAM=M-1\nD=M\nA=A-1\nD=M-D\n@{}\nD;JGT\n'
-            '@SP\nA=M-1\nM=0\n@{}\n0;JMP\n'
-            '({})\n@SP\nA=M-1\nM=-1\n'
-            '({})\n').format(label1, label2, label1, label2)
-
-def vm_lt():
-    '''Generate Hack Assembly code for a VM lt operation'''
-    label1 = "LT_TRUE_{}".format(id(vm_lt))
-    label2 = "LT_END_{}".format(id(vm_lt))
-    return ('@SP\nAM=M-1\nD=M\nA=A-1\nD=M-D\n@{}\nD;JLT\n'
-            '@SP\nA=M-1\nM=0\n@{}\n0;JMP\n'
-            '({})\n@SP\nA=M-1\nM=-1\n'
-            '({})\n').format(label1, label2, label1, label2)
-
-def vm_or():
-    '''Generate Hack Assembly code for a VM or operation'''
-    return '@SP\nAM=M-1\nD=M\n@SP\nAM=M-1\nM=M|D\n@SP\nM=M+1\n'
-
-def vm_function(function_name, n_vars):
-    '''Generate Hack Assembly code for a VM function operation'''
-    init_vars = ['@SP\nA=M\nM=0\n@SP\nM=M+1\n' for _ in range(n_vars)]
-    return '({})\n{}'.format(function_name, ''.join(init_vars))
-
-def vm_call(function_name, n_args):
-    '''Generate Hack Assembly code for a VM call operation'''
-    # This is a simplistic representation. A full vm_call would need to:
-    # 1. Push return address.
-    # 2. Push LCL, ARG, THIS, THAT.
-    # 3. ARG = SP-n-5, LCL = SP.
-    # 4. Transfer control to the called function.
-    return '@{}\n0;JMP\n'.format(function_name)
-
-def vm_return():
-    '''Generate Hack Assembly code for a VM return operation'''
-    # This is a simplistic representation. A full vm_return would need to:
-    # 1. FRAME = LCL.
-    # 2. RET = *(FRAME-5).
-    # 3. *ARG = pop().
-    # 4. SP = ARG+1.
-    # 5. THAT = *(FRAME-1), etc. for THIS, ARG, LCL.
-    # 6. goto RET.
-    return '@LCL\nD=M\n@R13\nM=D\nD=D-1\nA=D\nD=M\n@R14\nM=D\n@SP\nAM=M-1\n@ARG\nA=M\nM=D\nD=A+1\n@SP\nM=D\n@R13\nAM=M-1\nD=M\n@THAT\nM=D\n@R13\nAM=M-1\nD=M\n@THIS\nM=D\n@R13\nAM=M-1\nD=M\n@ARG\nM=D\n@R13\nAM=M-1\nD=M\n@LCL\nM=D\n@R14\nA=M\n0;JMP\n'
+        return VMTranslator.vm_compare('EQ', 'JEQ', label_id)
+
+    @staticmethod
+    def vm_gt(label_id=0):
+        '''Generate Hack Assembly code for a VM gt operation'''
+        return VMTranslator.vm_compare('GT', 'JGT', label_id)
+
+    @staticmethod
+    def vm_lt(label_id=0):
+        '''Generate Hack Assembly code for a VM lt operation'''
+        return VMTranslator.vm_compare('LT', 'JLT', label_id)
+
+    @staticmethod
+    def vm_compare(name, jump, label_id):
+        '''Generate Hack Assembly code for a comparison, replacing the top two values with true (-1) or false (0)'''
+        # label_id must be unique per use, or every comparison would jump to the first one's labels
+        label1 = "{}_TRUE_{}".format(name, label_id)
+        label2 = "{}_END_{}".format(name, label_id)
+        return ('@SP\nAM=M-1\nD=M\nA=A-1\nD=M-D\n@{}\nD;{}\n'
+                '@SP\nA=M-1\nM=0\n@{}\n0;JMP\n'
+                '({})\n@SP\nA=M-1\nM=-1\n'
+                '({})\n').format(label1, jump, label2, label1, label2)
+
+    @staticmethod
+    def vm_and():
+        '''Generate Hack Assembly code for a VM and operation'''
+        return '@SP\nAM=M-1\nD=M\nA=A-1\nM=D&M\n'
+
+    @staticmethod
+    def vm_or():
+        '''Generate Hack Assembly code for a VM or operation'''
+        return '@SP\nAM=M-1\nD=M\nA=A-1\nM=D|M\n'
+
+    @staticmethod
+    def vm_not():
+        '''Generate Hack Assembly code for a VM not operation'''
+        return '@SP\nA=M-1\nM=!M\n'
+
+    @staticmethod
+    def vm_label(label):
+        '''Generate Hack Assembly code for a VM label operation'''
+        return '({})\n'.format(label)
+
+    @staticmethod
+    def vm_goto(label):
+        '''Generate Hack Assembly code for a VM goto operation'''
+        return '@{}\n0;JMP\n'.format(label)
+
+    @staticmethod
+    def vm_if(label):
+        '''Generate Hack Assembly code for a VM if-goto operation'''
+        # pop the top of the stack and jump if it is not false (0)
+        return '@SP\nAM=M-1\nD=M\n@{}\nD;JNE\n'.format(label)
+
+    @staticmethod
+    def vm_function(function_name, n_vars):
+        '''Generate Hack Assembly code for a VM function operation'''
+        init_vars = ['@SP\nA=M\nM=0\n@SP\nM=M+1\n' for _ in range(n_vars)]
+        return '({})\n{}'.format(function_name, ''.join(init_vars))
+
+    @staticmethod
+    def vm_call(function_name, n_args, label_id=0):
+        '''Generate Hack Assembly code for a VM call operation'''
+        return_label = 'RET_ADDRESS_{}'.format(label_id)
+        # push the return address, then the caller's LCL, ARG, THIS and THAT
+        asm_code = '@{}\nD=A\n@SP\nA=M\nM=D\n@SP\nM=M+1\n'.format(return_label)
+        for pointer in ('LCL', 'ARG', 'THIS', 'THAT'):
+            asm_code += '@{}\nD=M\n@SP\nA=M\nM=D\n@SP\nM=M+1\n'.format(pointer)
+        # ARG = SP-n-5, LCL = SP, then transfer control and mark where to come back to
+        asm_code += '@SP\nD=M\n@{}\nD=D-A\n@ARG\nM=D\n@SP\nD=M\n@LCL\nM=D\n'.format(n_args + 5)
+        asm_code += '@{}\n0;JMP\n({})\n'.format(function_name, return_label)
+        return asm_code
+
+    @staticmethod
+    def vm_return():
+        '''Generate Hack Assembly code for a VM return operation'''
+        # FRAME = LCL (kept in R13), RET = *(FRAME-5) (kept in R14)
+        asm_code = '@LCL\nD=M\n@R13\nM=D\n@5\nA=D-A\nD=M\n@R14\nM=D\n'
+        # *ARG = pop(), SP = ARG+1
+        asm_code += '@SP\nAM=M-1\nD=M\n@ARG\nA=M\nM=D\nD=A+1\n@SP\nM=D\n'
+        # THAT = *(FRAME-1), THIS = *(FRAME-2), ARG = *(FRAME-3), LCL = *(FRAME-4)
+        for pointer in ('THAT', 'THIS', 'ARG', 'LCL'):
+            asm_code += '@R13\nAM=M-1\nD=M\n@{}\nM=D\n'.format(pointer)
+        # goto RET
+        asm_code += '@R14\nA=M\n0;JMP\n'
+        return asm_code
+
+
+    @staticmethod
+    def vm_load(segment, offset):
+        '''Generate Hack Assembly code that loads a segment value (or a constant) into D'''
+        if segment == 'constant':
+            if offset >= 0:
+                return '@{}\nD=A\n'.format(offset)
+            if offset == -32768:
+                # 32768 does not fit in an A-instruction, but !32767 is -32768
+                return '@32767\nD=!A\n'
+            # negative constants are loaded as their magnitude and negated
+            return '@{}\nD=-A\n'.format(-offset)
+        if segment in segment_pointers:
+            return VMTranslator.segment_address(segment, offset) + 'D=M\n'
+        return '@{}\nD=M\n'.format(VMTranslator.fixed_address(segment, offset))
+
+    @staticmethod
+    def vm_store(segment, offset):
+        '''Generate Hack Assembly code that stores D into a segment'''
+        if segment in segment_pointers:
+            if offset <= 8:
+                return VMTranslator.segment_address(segment, offset) + 'M=D\n'
+            # D is needed for the value, so compute the address into R14 first
+            return ('@R13\nM=D\n@{}\nD=M\n@{}\nD=D+A\n@R14\nM=D\n@R13\nD=M\n@R14\nA=M\nM=D\n'
+                    ).format(segment_pointers[segment], offset)
+        if segment == 'constant':
+            raise VMTranslatorError("Cannot pop to segment 'constant'")
+        return '@{}\nM=D\n'.format(VMTranslator.fixed_address(segment, offset))
+
+    @staticmethod
+    def segment_address(segment, offset):
+        '''Generate Hack Assembly code that points A at local/argument/this/that + offset without touching D'''
+        pointer = segment_pointers[segment]
+        if offset == 0:
+            return '@{}\nA=M\n'.format(pointer)
+        if offset <= 8:
+            # stepping A is cheaper than adding the offset for small offsets
+            return '@{}\nA=M+1\n'.format(pointer) + 'A=A+1\n' * (offset - 1)
+        return '@{}\nD=M\n@{}\nA=D+A\n'.format(pointer, offset)
+
+    @staticmethod
+    def fixed_address(segment, offset):
+        '''Return the address symbol of a pointer/temp/static segment entry'''
+        if segment == 'pointer':
+            return 3 if offset == 0 else 4
+        if segment == 'temp':
+            return 5 + offset
+        if segment == 'static':
+            # the translator passes the File.N symbol; a bare index gets the generic prefix
+            return offset if isinstance(offset, str) else 'static.{}'.format(offset)
+        raise VMTranslatorError("Invalid segment '{}'".format(segment))
+
+    @staticmethod
+    def vm_move(source_segment, source_offset, segment, offset):
+        '''Generate Hack Assembly code for a fused push/pop pair, copying memory without touching the stack'''
+        return VMTranslator.vm_load(source_segment, source_offset) + VMTranslator.vm_store(segment, offset)
+
+    @staticmethod
+    def vm_push_op(segment, offset, operator):
+        '''Generate Hack Assembly code for a push followed by add/sub/and/or, updating the top of the stack in place'''
+        if segment == 'constant' and operator in ('add', 'sub') and offset in (1, -1):
+            # x+1, x-1 need no D at all
+            step = offset if operator == 'add' else -offset
+            return '@SP\nA=M-1\nM=M{}1\n'.format('+' if step == 1 else '-')
+        return VMTranslator.vm_load(segment, offset) + '@SP\nA=M-1\nM={}\n'.format(in_place_operators[operator])
+
+    @staticmethod
+    def vm_compare_shared(name, label_id):
+        '''Generate Hack Assembly code that runs a comparison through its shared routine'''
+        # the routine returns to the address passed in D
+        return_label = '{}_RETURN_{}'.format(name, label_id)
+        return '@{}\nD=A\n@VM_{}\n0;JMP\n({})\n'.format(return_label, name, return_label)
+
+    @staticmethod
+    def vm_call_shared(function_name, n_args, label_id=0):
+        '''Generate Hack Assembly code for a VM call operation through the shared call routine'''
+        # R13 = n_args+5, R14 = callee, D = return address
+        return_label = 'RET_ADDRESS_{}'.format(label_id)
+        return ('@{}\nD=A\n@R13\nM=D\n@{}\nD=A\n@R14\nM=D\n'
+                '@{}\nD=A\n@VM_CALL\n0;JMP\n({})\n').format(n_args + 5, function_name, return_label, return_label)
+
+    @staticmethod
+    def vm_return_shared():
+        '''Generate Hack Assembly code for a VM return operation through the shared return routine'''
+        return '@VM_RETURN\n0;JMP\n'
+
+    @staticmethod
+    def routine_compare(name, jump):
+        '''Generate the shared routine for a comparison; the return address arrives in D'''
+        # the result slot is set to true up front and overwritten with false if the jump is not taken
+        return ('(VM_{0})\n@R13\nM=D\n@SP\nAM=M-1\nD=M\nA=A-1\nD=M-D\nM=-1\n@VM_{0}_END\nD;{1}\n'
+                '@SP\nA=M-1\nM=0\n(VM_{0}_END)\n@R13\nA=M\n0;JMP\n').format(name, jump)
+
+    @staticmethod
+    def routine_call():
+        '''Generate the shared call routine; D = return address, R13 = n_args+5, R14 = callee'''
+        asm_code = '(VM_CALL)\n@SP\nA=M\nM=D\n@SP\nM=M+1\n'
+        for pointer in ('LCL', 'ARG', 'THIS', 'THAT'):
+            asm_code += '@{}\nD=M\n@SP\nA=M\nM=D\n@SP\nM=M+1\n'.format(pointer)
+        # ARG = SP-n-5, LCL = SP, goto callee
+        asm_code += '@SP\nD=M\n@R13\nD=D-M\n@ARG\nM=D\n@SP\nD=M\n@LCL\nM=D\n@R14\nA=M\n0;JMP\n'
+        return asm_code
+
+    @staticmethod
+    def routine_return():
+        '''Generate the shared return routine'''
+        return '(VM_RETURN)\n' + VMTranslator.vm_return()
+
+
+class StackCachingTranslator(VMTranslator):
+    """
+    Alternative code generator that keeps the top of the stack in the D register.
+
+    Within straight-line code the logical top of stack may live in D instead of at
+    RAM[SP-1] (in which case SP does not count it yet). push only spills the previous
+    top when it needs D for the new value, arithmetic works on D directly and pop
+    stores D without touching the stack. Before labels, calls, returns, jumps, shared
+    routines and at the end of the program the cached value is spilled, so memory is
+    in exactly the state the plain generator would leave it at every block boundary.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # whether the logical top of stack is held in D
+        self.cached = False
+
+    # SP++ and store D at the old top
+    spill_code = '@SP\nAM=M+1\nA=A-1\nM=D\n'
+    # SP-- and load the new top into D
+    fill_code = '@SP\nAM=M-1\nD=M\n'
+
+    def spill(self):
+        '''Generate Hack Assembly code that writes a cached top of stack back to memory'''
+        if not self.cached:
+            return ''
+        self.cached = False
+        return self.spill_code
+
+    def fill(self):
+        '''Generate Hack Assembly code that pops the top of stack into D so it is cached'''
+        if self.cached:
+            return ''
+        self.cached = True
+        return self.fill_code
+
+    @staticmethod
+    def compare(command, label_id):
+        '''Generate Hack Assembly code for eq/gt/lt with y cached in D, leaving the result cached in D'''
+        true_label = '{}_TRUE_{}'.format(command.upper(), label_id)
+        end_label = '{}_END_{}'.format(command.upper(), label_id)
+        # both paths leave the result in D, so it stays cached past the internal labels
+        return ('@SP\nAM=M-1\nD=M-D\n@{0}\nD;{2}\nD=0\n@{1}\n0;JMP\n'
+                '({0})\nD=-1\n({1})\n').format(true_label, end_label, 'J' + command.upper())
+
+    def generateCommand(self, command, handler, args):
+        if command == 'push':
+            segment, offset = args
+            asm_code = self.spill() + VMTranslator.vm_load(segment, offset)
+            self.cached = True
+            return asm_code
+        if command == 'pop':
+            segment, offset = args
+            asm_code = self.fill() + VMTranslator.vm_store(segment, offset)
+            self.cached = False
+            return asm_code
+        if command in in_place_operators:
+            # x is at RAM[SP-1], y in D; pop x's slot and leave x op y in D
+            return self.fill() + '@SP\nAM=M-1\nD={}\n'.format(in_place_operators[command])
+        if command in ('neg', 'not'):
+            return self.fill() + 'D={}D\n'.format('-' if command == 'neg' else '!')
+        if command in ('eq', 'gt', 'lt'):
+            if not self.shared_routines:
+                return self.fill() + self.compare(command, args[0])
+            # the saving of the shared routine is measured against this generator's inline code (a fill unless
+            # y is already cached, then the compare), not the plain generator's that generateCommand assumes
+            inline = countWords(self.compare(command, 0)) + (0 if self.cached else countWords(self.fill_code))
+            asm_code = self.spill()
+            self.words_saved += inline - inline_words[command] - countWords(asm_code)
+            return asm_code + super().generateCommand(command, handler, args)
+        if command == 'if-goto':
+            # the condition is consumed, so both paths continue with nothing cached
+            asm_code = self.fill() + '@{}\nD;JNE\n'.format(args[0])
+            self.cached = False
+            return asm_code
+        # anything else expects the whole stack in memory
+        return self.spill() + super().generateCommand(command, handler, args)
+
+    def finishFile(self):
+        return self.spill()
+
+
+def countWords(asm_code):
+    # ROM words taken by a piece of assembly: every line except labels
+    return asm_code.count('\n') - asm_code.count('(')
+
+
+# base pointers of the stack-allocated segments
+segment_pointers = {'local': 'LCL', 'argument': 'ARG', 'this': 'THIS', 'that': 'THAT'}
+
+# comp fields for updating the top of the stack (M) with D
+in_place_operators = {'add': 'D+M', 'sub': 'M-D', 'and': 'D&M', 'or': 'D|M'}
+
+
+class VMOptimizer:
+    """
+    Rewrites a list of VM commands before code generation.
+
+    Optimizations (each can be switched off):
+    - fold_constants: 'push constant a; push constant b; add' (and sub/and/or/eq/gt/lt, neg/not)
+      becomes a single 'push constant', with 16-bit wraparound as the generated code would have;
+      adding/subtracting/or-ing constant 0 is dropped.
+    - fuse_push_pop: 'push S i; pop T j' becomes a direct memory 'move'.
+    - in_place_arithmetic: 'push S i; add' (sub/and/or) updates the top of the stack in place.
+    - remove_dead_code: commands after goto/return up to the next label/function are dropped.
+    The rewritten commands 'move' and 'push-op' are translated by VMTranslator like any other.
+    """
+    OPTIMIZATIONS = ('fold_constants', 'fuse_push_pop', 'in_place_arithmetic', 'remove_dead_code')
+
+    def __init__(self, fold_constants=True, fuse_push_pop=True, in_place_arithmetic=True, remove_dead_code=True):
+        self.enabled = {'fold_constants': fold_constants, 'fuse_push_pop': fuse_push_pop,
+                        'in_place_arithmetic': in_place_arithmetic, 'remove_dead_code': remove_dead_code}
+        self.hits = dict.fromkeys(self.OPTIMIZATIONS, 0)
+        self.commands_before = 0
+        self.commands_after = 0
+
+    def optimize(self, commands):
+        """
+        @param commands: A list of (tokens, line number) pairs, as produced by VMTranslator.iterCommands.
+        @return: A new list of (tokens, line number) pairs.
+        """
+        fold = self.enabled['fold_constants']
+        fuse = self.enabled['fuse_push_pop']
+        in_place = self.enabled['in_place_arithmetic']
+        dead_code = self.enabled['remove_dead_code']
+        hits = self.hits
+
+        out = []
+        reachable = True
+        for command in commands:
+            tokens, line_number = command
+            name = tokens[0].lower()
+            # command and segment names are case-insensitive; every later stage compares them in lowercase
+            normalized = [name] + tokens[1:]
+            if name in ('push', 'pop') and len(tokens) == 3:
+                normalized[1] = tokens[1].lower()
+            if normalized != tokens:
+                tokens = normalized
+                command = (tokens, line_number)
+            if not reachable:
+                if name not in ('label', 'function'):
+                    hits['remove_dead_code'] += 1
+                    continue
+                reachable = True
+            out.append(command)
+
+            if fold:
+                self._fold(out)
+            if name in binary_operators:
+                # folding may have consumed the command, or left out empty
+                previous = out[-2][0] if len(out) >= 2 else None
+                if (in_place and name in in_place_operators and out and out[-1][0][0] == name
+                        and previous is not None and previous[0] == 'push' and len(previous) == 3):
+                    out[-2:] = [(['push-op', previous[1], previous[2], name], line_number)]
+                    hits['in_place_arithmetic'] += 1
+            elif name == 'pop' and fuse and len(out) >= 2 and len(tokens) == 3:
+                previous = out[-2][0]
+                if previous[0] == 'push' and len(previous) == 3:
+                    out[-2:] = [(['move', previous[1], previous[2], tokens[1], tokens[2]], line_number)]
+                    hits['fuse_push_pop'] += 1
+            elif name in ('goto', 'return') and dead_code:
+                reachable = False
+
+        self.commands_before += len(commands)
+        self.commands_after += len(out)
+        return out
+
+    def _fold(self, out):
+        # folds constant expressions at the end of out, repeatedly, since one fold can enable the next
+        while out:
+            tokens, line_number = out[-1]
+            name = tokens[0]
+            if name in ('add', 'sub', 'or') and len(out) >= 2 and self._constant(out[-2][0]) == 0:
+                # x+0, x-0 and x|0 leave x unchanged, whatever computed x
+                del out[-2:]
+            elif name in binary_operators and len(out) >= 3:
+                x, y = self._constant(out[-3][0]), self._constant(out[-2][0])
+                if x is None or y is None:
+                    return
+                out[-3:] = [(['push', 'constant', str(binary_operators[name](x, y))], line_number)]
+            elif name in unary_operators and len(out) >= 2:
+                x = self._constant(out[-2][0])
+                if x is None:
+                    return
+                out[-2:] = [(['push', 'constant', str(unary_operators[name](x))], line_number)]
+            else:
+                return
+            self.hits['fold_constants'] += 1
+
+    def _constant(self, tokens):
+        # the value pushed by 'push constant N', or None
+        if len(tokens) == 3 and tokens[0] == 'push' and tokens[1] == 'constant':
+            try:
+                return int(tokens[2])
+            except ValueError:
+                return None
+        return None
+
+    def merge(self, other):
+        """
+        Adds the statistics of another optimizer, e.g. one that ran in a worker process.
+        @param other: A VMOptimizer.
+        """
+        for optimization in self.OPTIMIZATIONS:
+            self.hits[optimization] += other.hits[optimization]
+        self.commands_before += other.commands_before
+        self.commands_after += other.commands_after
+
+    def stats(self):
+        """
+        @return: A multi-line summary of the optimizations applied.
+        """
+        lines = ['VM optimizer: {} -> {} commands'.format(self.commands_before, self.commands_after)]
+        for optimization in self.OPTIMIZATIONS:
+            state = '' if self.enabled[optimization] else ' (disabled)'
+            lines.append('  {:<20} {}{}'.format(optimization, self.hits[optimization], state))
+        return '\n'.join(lines)
+
+
+class SourceMap:
+    """
+    Maps every ROM address of a translated program back to its line in the .asm output and to the VM command
+    (file, line, enclosing function) it was generated for.
+
+    Code that no VM line produced is attributed to a description instead: '<bootstrap>', '<end of file>'
+    (code flushed at the end of a file) and '<shared routines>'.
+    """
+
+    def __init__(self):
+        # (file name, VM line, function, command) of each piece of recorded code
+        self.origins = []
+        # per ROM address: the .asm line, and the index of its origin
+        self.asm_lines = array('i')
+        self.origin_ids = array('i')
+        # .asm lines recorded so far
+        self.lines = 0
+
+    def add(self, asm_code, origin):
+        """
+        Records the next piece of generated code.
+
+        @param asm_code: The assembly code, one instruction or label per line.
+        @param origin: (file name, VM line, function, command) it was generated for.
+        """
+        origin_id = len(self.origins)
+        self.origins.append(origin)
+        line = self.lines
+        for text in asm_code.splitlines():
+            line += 1
+            # labels take no ROM word
+            if text[:1] != '(':
+                self.asm_lines.append(line)
+                self.origin_ids.append(origin_id)
+        self.lines = line
+
+    def extend(self, other):
+        """
+        Appends the map of code that follows the code mapped so far, e.g. the next file of a program.
+        @param other: A SourceMap.
+        """
+        first_id = len(self.origins)
+        self.origins.extend(other.origins)
+        self.asm_lines.extend(line + self.lines for line in other.asm_lines)
+        self.origin_ids.extend(origin_id + first_id for origin_id in other.origin_ids)
+        self.lines += other.lines
+
+    def lookup(self, address):
+        """
+        @param address: A ROM address.
+        @return: (.asm line, file name, VM line, function, command).
+        """
+        return (self.asm_lines[address],) + self.origins[self.origin_ids[address]]
+
+    def __len__(self):
+        return len(self.asm_lines)
+
+    def write(self, stream):
+        """
+        Writes the map as text, one tab-separated line per ROM address: address, .asm line, file:line,
+        function and command.
+        """
+        for address in range(len(self.asm_lines)):
+            asm_line, file_name, line_number, function_name, command = self.lookup(address)
+            stream.write('{}\t{}\t{}:{}\t{}\t{}\n'.format(
+                address, asm_line, file_name or '-', line_number, function_name or '-', command))
+
+
+class TranslationCache:
+    """
+    On-disk cache of translated .vm files, used by VMTranslator.translateProgram.
+
+    Entries are keyed by a hash of the file's text, its name, the translator version and the options, and
+    store what translating the file produced: (assembly code, shared routines used, ROM words saved,
+    optimizer, source map). Every label a file defines is namespaced by its file name (File.N statics, File.N label
+    ids, Function$label), so a cached fragment can be spliced into any program containing that file.
+    The least recently used entries are evicted beyond max_entries.
+    """
+    # bump whenever the generated code or the cache layout changes
+    VERSION = 2
+
+    def __init__(self, path, max_entries=1024):
+        self.path = path
+        self.max_entries = max_entries
+        # key -> entry, least recently used first
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load()
+
+    def load(self):
+        """
+        Loads the cache from disk, silently starting empty if it is missing, stale or unreadable.
+        """
+        try:
+            with open(self.path, "rb") as cache_file:
+                data = pickle.load(cache_file)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+            return
+        if not isinstance(data, dict) or data.get('version') != self.VERSION:
+            return
+        self.entries = data['entries']
+
+    def save(self):
+        """
+        Atomically writes the cache to disk.
+        """
+        data = {'version': self.VERSION, 'entries': self.entries}
+        temp_path = self.path + '.tmp'
+        with open(temp_path, "wb") as cache_file:
+            pickle.dump(data, cache_file, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self.path)
+
+    def key(self, source, file_name, options):
+        """
+        @param source: The file's text, as bytes.
+        @param file_name: The file's name without extension; it names the file's statics and labels.
+        @param options: Anything affecting the generated code, as a tuple with a stable repr.
+        @return: The cache key.
+        """
+        digest = hashlib.blake2b(source, digest_size=16)
+        digest.update(repr((self.VERSION, file_name, options)).encode())
+        return digest.hexdigest()
+
+    def get(self, key):
+        """
+        @return: The cached entry, or None (counted as a miss).
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        """
+        @return: A one-line summary of the last run.
+        """
+        return 'Translation cache: {} hits, {} misses, {} evicted, {} entries'.format(
+            self.hits, self.misses, self.evictions, len(self.entries))
+
+
+def signed16(value):
+    # wraps a Python int to the signed 16-bit range, as Hack arithmetic does
+    value &= 0xFFFF
+    return value - 0x10000 if value & 0x8000 else value
+
+
+# constant folding rules; gt/lt test the sign of the wrapped difference exactly like the generated D=M-D;JGT/JLT code
+binary_operators = {
+    'add': lambda x, y: signed16(x + y),
+    'sub': lambda x, y: signed16(x - y),
+    'and': lambda x, y: signed16(x & y),
+    'or': lambda x, y: signed16(x | y),
+    'eq': lambda x, y: -1 if signed16(x - y) == 0 else 0,
+    'gt': lambda x, y: -1 if signed16(x - y) > 0 else 0,
+    'lt': lambda x, y: -1 if signed16(x - y) < 0 else 0,
+}
+unary_operators = {
+    'neg': lambda x: signed16(-x),
+    'not': lambda x: signed16(~x),
+}
+
+
+# dispatch table: command -> (code generator, argument kinds, needs a unique label id)
+# 'int' arguments are parsed as numbers and 'label' arguments are scoped to the current function
+commands = {
+    'add': (VMTranslator.vm_add, (), False),
+    'sub': (VMTranslator.vm_sub, (), False),
+    'neg': (VMTranslator.vm_neg, (), False),
+    'eq': (VMTranslator.vm_eq, (), True),
+    'gt': (VMTranslator.vm_gt, (), True),
+    'lt': (VMTranslator.vm_lt, (), True),
+    'and': (VMTranslator.vm_and, (), False),
+    'or': (VMTranslator.vm_or, (), False),
+    'not': (VMTranslator.vm_not, (), False),
+    'push': (VMTranslator.vm_push, ('segment', 'int'), False),
+    'pop': (VMTranslator.vm_pop, ('segment', 'int'), False),
+    'label': (VMTranslator.vm_label, ('label',), False),
+    'goto': (VMTranslator.vm_goto, ('label',), False),
+    'if-goto': (VMTranslator.vm_if, ('label',), False),
+    'function': (VMTranslator.vm_function, ('name', 'int'), False),
+    'call': (VMTranslator.vm_call, ('name', 'int'), True),
+    'return': (VMTranslator.vm_return, (), False),
+    # produced by VMOptimizer
+    'move': (VMTranslator.vm_move, ('segment', 'int', 'segment', 'int'), False),
+    'push-op': (VMTranslator.vm_push_op, ('segment', 'int', 'operator'), False),
+}
+
+# code-size optimized overrides used with shared_routines, with the routine each one jumps into
+shared_commands = {
+    'eq': (lambda label_id: VMTranslator.vm_compare_shared('EQ', label_id), (), True, 'EQ'),
+    'gt': (lambda label_id: VMTranslator.vm_compare_shared('GT', label_id), (), True, 'GT'),
+    'lt': (lambda label_id: VMTranslator.vm_compare_shared('LT', label_id), (), True, 'LT'),
+    'call': (VMTranslator.vm_call_shared, ('name', 'int'), True, 'CALL'),
+    'return': (VMTranslator.vm_return_shared, (), False, 'RETURN'),
+}
+
+# routine name -> generator of the routine's code
+shared_routines = {
+    'EQ': lambda: VMTranslator.routine_compare('EQ', 'JEQ'),
+    'GT': lambda: VMTranslator.routine_compare('GT', 'JGT'),
+    'LT': lambda: VMTranslator.routine_compare('LT', 'JLT'),
+    'CALL': VMTranslator.routine_call,
+    'RETURN': VMTranslator.routine_return,
+}
+
+# ROM words each of those commands takes when inlined
+inline_words = {
+    'eq': countWords(VMTranslator.vm_eq()),
+    'gt': countWords(VMTranslator.vm_gt()),
+    'lt': countWords(VMTranslator.vm_lt()),
+    'call': countWords(VMTranslator.vm_call('f', 0)),
+    'return': countWords(VMTranslator.vm_return()),
+}
+
+# standalone versions of the code generators
+vm_eq = VMTranslator.vm_eq
+vm_gt = VMTranslator.vm_gt
+vm_lt = VMTranslator.vm_lt
+vm_or = VMTranslator.vm_or
+vm_function = VMTranslator.vm_function
+vm_call = VMTranslator.vm_call
+vm_return = VMTranslator.vm_return
+
+
+def translate(source, stream=None):
+    """
+    Translates a whole VM program with a fresh VMTranslator.
+    @see VMTranslator.translate
+    """
+    return VMTranslator().translate(source, stream)
+
+
+def expandSources(path):
+    """
+    @param path: A .vm file or a directory.
+    @return: The .vm files to translate, sorted by name for a directory.
+    """
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, '*.vm')))
+    return [path]
+
+
+def _translateFile(path, source, translator_class, shared_routines, enabled, source_map):
+    """
+    translateProgram worker; translates one file of a program without its shared routines.
+    @param source: The text of the file, or None to read it from path.
+    @param enabled: The VMOptimizer settings, or None to skip optimization.
+    @param source_map: Whether to build a source map for the file.
+    @return: (assembly code, shared routines used, ROM words saved, the optimizer used or None, SourceMap or None)
+    """
+    optimizer = VMOptimizer(**enabled) if enabled is not None else None
+    translator = translator_class(shared_routines=shared_routines, optimizer=optimizer,
+                                  source_map=SourceMap() if source_map else None)
+    file_name = os.path.splitext(os.path.basename(path))[0]
+    if source is None:
+        with open(path, "r") as a_file:
+            source = a_file.read()
+    try:
+        asm_code = translator.translate(source, file_name=file_name, finish=False)
+    except VMTranslatorError as e:
+        raise VMTranslatorError('{}: {}'.format(path, e.message)) from None
+    return asm_code, list(translator.used_routines), translator.words_saved, optimizer, translator.source_map
 
 
 # A quick-and-dirty parser when run as a standalone script.
 if __name__ == "__main__":
-    import sys
-    if(len(sys.argv) > 1):
-        with open(sys.argv[1], "r") as a_file:
-            for line in a_file:
-                tokens = line.strip().lower().split()
-                if(len(tokens)==1):
-                    if(tokens[0]=='add'):
-                        print(VMTranslator.vm_add())
-                    elif(tokens[0]=='sub'):
-                        print(VMTranslator.vm_sub())
-                    elif(tokens[0]=='neg'):
-                        print(VMTranslator.vm_neg())
-                    elif(tokens[0]=='eq'):
-                        print(VMTranslator.vm_eq())
-                    elif(tokens[0]=='gt'):
-                        print(VMTranslator.vm_gt())
-                    elif(tokens[0]=='lt'):
-                        print(VMTranslator.vm_lt())
-                    elif(tokens[0]=='and'):
-                        print(VMTranslator.vm_and())
-                    elif(tokens[0]=='or'):
-                        print(VMTranslator.vm_or())
-                    elif(tokens[0]=='not'):
-                        print(VMTranslator.vm_not())
-                    elif(tokens[0]=='return'):
-                        print(VMTranslator.vm_return())
-                elif(len(tokens)==2):
-                    if(tokens[0]=='label'):
-                        print(VMTranslator.vm_label(tokens[1]))
-                    elif(tokens[0]=='goto'):
-                        print(VMTranslator.vm_goto(tokens[1]))
-                    elif(tokens[0]=='if-goto'):
-                        print(VMTranslator.vm_if(tokens[1]))
-                elif(len(tokens)==3):
-                    if(tokens[0]=='push'):
-                        print(VMTranslator.vm_push(tokens[1],int(tokens[2])))
-                    elif(tokens[0]=='pop'):
-                        print(VMTranslator.vm_pop(tokens[1],int(tokens[2])))
-                    elif(tokens[0]=='function'):
-                        print(VMTranslator.vm_function(tokens[1],int(tokens[2])))
-                    elif(tokens[0]=='call'):
-                        print(VMTranslator.vm_call(tokens[1],int(tokens[2])))
-
-        
\ No newline at end of file
+    import argparse
+    arg_parser = argparse.ArgumentParser(description='Translate a .vm file or a directory of .vm files to Hack '
+                                                     'assembly, printed to stdout.')
+    arg_parser.add_argument('file', help="the .vm file, a directory translated as one program, or '-' for stdin")
+    arg_parser.add_argument('-o', '--output', help="write the assembly to this file instead of stdout ('-')")
+    arg_parser.add_argument('--name', help='with stdin, the file name to give statics and labels (e.g. Main)')
+    arg_parser.add_argument('-j', '--jobs', type=int, help='translate the files in this many worker processes')
+    arg_parser.add_argument('--bootstrap', action=argparse.BooleanOptionalAction, default=None,
+                            help='emit SP=256 and call Sys.init first (default: only if there is a Sys.vm)')
+    arg_parser.add_argument('--shared', action='store_true',
+                            help='optimize for ROM size by sharing the eq/gt/lt/call/return code')
+    arg_parser.add_argument('--cache-tos', action='store_true',
+                            help='use the stack-caching code generator that keeps the top of stack in D')
+    arg_parser.add_argument('-O', '--optimize', action='store_true',
+                            help='run the VM optimizer (constant folding, push/pop fusion, ...) before code generation')
+    arg_parser.add_argument('--disable', action='append', default=[], choices=VMOptimizer.OPTIMIZATIONS,
+                            help='with -O, turn off one optimization (may be repeated)')
+    arg_parser.add_argument('--incremental', action='store_true',
+                            help='reuse the translations of unchanged files cached by previous runs (FILE.vmcache)')
+    arg_parser.add_argument('--cache-size', type=int, default=1024,
+                            help='with --incremental, the number of translated files kept in the cache')
+    arg_parser.add_argument('--hack', action='store_true',
+                            help='print Hack machine code instead of assembly, assembling in memory (needs Assembler.py)')
+    arg_parser.add_argument('--source-map', metavar='FILE',
+                            help='write the .asm line and VM command behind every ROM address to FILE')
+    arg_parser.add_argument('--stats', action='store_true', help='print code size statistics to stderr')
+    args = arg_parser.parse_args()
+
+    optimizer = None
+    if args.optimize:
+        optimizer = VMOptimizer(**{name: name not in args.disable for name in VMOptimizer.OPTIMIZATIONS})
+    translator_class = StackCachingTranslator if args.cache_tos else VMTranslator
+    source_map = SourceMap() if args.source_map else None
+    translator = translator_class(shared_routines=args.shared, optimizer=optimizer, source_map=source_map)
+    if args.file == '-' and (args.hack or args.incremental):
+        arg_parser.error('--hack and --incremental need .vm files, not stdin')
+    paths = expandSources(args.file)
+    if not paths:
+        sys.exit('{}: no .vm files found'.format(args.file))
+    cache = None
+    if args.incremental:
+        cache = TranslationCache(os.path.normpath(args.file) + '.vmcache', args.cache_size)
+    if args.hack and Assembler is None:
+        arg_parser.error('--hack needs Assembler.py in ../Assembler')
+    if args.hack and args.incremental:
+        arg_parser.error('--hack cannot be combined with --incremental')
+    out_file = None
+    try:
+        if args.output and args.output != '-':
+            out_file = open(args.output, "w")
+        out_stream = out_file or sys.stdout
+        if args.file == '-':
+            # one program piped in, translated as it arrives (-O has to see it whole first)
+            if args.bootstrap:
+                out_stream.write(translator.bootstrap())
+            translator.translate(sys.stdin, out_stream, args.name)
+        elif args.hack:
+            words = translator.assembleProgram(paths, args.bootstrap)
+            translator.assembler.writeHack(words, out_stream)
+        else:
+            translator.translateProgram(paths, out_stream, args.jobs, args.bootstrap, cache)
+    except (VMTranslatorError, OSError) as e:
+        sys.exit(getattr(e, 'message', None) or str(e))
+    finally:
+        if out_file:
+            out_file.close()
+    if cache is not None:
+        cache.save()
+    if source_map is not None:
+        with open(args.source_map, "w") as map_file:
+            source_map.write(map_file)
+    if args.stats:
+        if args.shared:
+            print(translator.stats(), file=sys.stderr)
+        if optimizer is not None:
+            print(optimizer.stats(), file=sys.stderr)
+        if cache is not None:
+            print(cache.stats(), file=sys.stderr)